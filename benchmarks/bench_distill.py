@@ -0,0 +1,44 @@
+"""
+Tokens sent to the summarizer per page, before and after distillation.
+
+    python -m benchmarks.bench_distill [saved_pages_dir] [--budget 1500]
+
+Saved pages are reported under their file name, which is expected to be the domain.
+"""
+import os
+import glob
+import time
+import argparse
+
+from benchmarks.corpus import load_pages
+from util.distill import distill, count_tokens
+from util.htmltext import html_to_text
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("directory", nargs = "?")
+    parser.add_argument("--budget", type = int, default = 1500)
+    args = parser.parse_args()
+
+    pages = load_pages(args.directory)
+    if args.directory:
+        names = [os.path.splitext(os.path.basename(path))[0] for path in sorted(glob.glob(os.path.join(args.directory, "*.html")))]
+    else:
+        names = [f"company{i}" for i in range(len(pages))]
+
+    total_before = total_after = 0
+    elapsed = 0
+    print(f"{'domain':<32} {'before':>8} {'after':>8}")
+    for name, html in zip(names, pages):
+        before = count_tokens(html_to_text(html))
+        start = time.perf_counter()
+        text = distill(html, args.budget)
+        elapsed += time.perf_counter() - start
+        after = count_tokens(text)
+        total_before += before
+        total_after += after
+        print(f"{name:<32} {before:>8} {after:>8}")
+
+    print(f"{'total':<32} {total_before:>8} {total_after:>8}  ({100 * (1 - total_after / max(total_before, 1)):.0f}% fewer tokens)")
+    print(f"distillation took {1000 * elapsed / max(len(pages), 1):.1f} ms per page")
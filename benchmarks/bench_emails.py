@@ -0,0 +1,105 @@
+"""
+Email extraction micro-benchmarks on fixed text corpora.
+
+    python -m benchmarks.bench_emails [--save results.json] [--compare results.json]
+
+Each case reports emails/s and MB/s of scanned text. --compare exits with status 1
+when a case's throughput is more than 20% below the saved results.
+"""
+import re
+import sys
+import json
+import time
+import random
+import argparse
+
+from benchmarks.corpus import load_pages, sentence, email
+from util.extractor import EmailExtractor
+from util.htmltext import html_to_text
+
+BLACKLIST = "redaction dpo devis sales info rgpd gouv partenariat partnership support".split(' ')
+TOLERANCE = 0.8
+
+
+def legacy_extract(text: str, blacklist: list[str]) -> set[str]:
+    """
+    The per-call implementation Scraper.extract_emails used before EmailExtractor.
+    """
+    tlds = r'(?:com|net|org|fr|studio|dev|io|tech)'
+    email_regex = r'\b[a-z0-9._%+-]+@[a-zA-Z0-9.-]+\.' + tlds + r'\b'
+    blacklist_regex = '|'.join(blacklist)
+    emails = set(re.findall(email_regex, text, re.IGNORECASE))
+    filtered_emails = {email for email in emails if not re.search(blacklist_regex, email)}
+    valid_emails = set()
+    for email in filtered_emails:
+        local_part, domain = email.split('@', 1)
+        if local_part.islower() and local_part.replace('.', '').replace('_', '').isalnum():
+            valid_emails.add(email)
+        if local_part[0].isdigit():
+            local_part = re.sub(r'^\d+', '', local_part)
+            email = f"{local_part}@{domain}"
+            if local_part.islower() and local_part.replace('.', '').replace('_', '').isalnum():
+                valid_emails.add(email)
+    return valid_emails
+
+
+def corpora() -> dict[str, list[str]]:
+    rng = random.Random(1)
+    return {
+        "pages": [html_to_text(page) for page in load_pages(count = 40)],
+        "dense": [" ".join(email(rng, i) if i % 3 == 0 else sentence(rng, 4) for i in range(400)) for _ in range(40)],
+        "sparse": [sentence(rng, 2000) for _ in range(40)],
+    }
+
+
+def run_case(extract, texts: list[str], repeat: int = 5) -> tuple[float, set[str]]:
+    """
+    Returns the best time over repeat runs, and the extracted emails.
+    """
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        emails = extract(texts)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, emails
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--save")
+    parser.add_argument("--compare")
+    args = parser.parse_args()
+
+    extractor = EmailExtractor(BLACKLIST)
+    implementations = {
+        "legacy": lambda texts: set().union(*(legacy_extract(text, BLACKLIST) for text in texts)),
+        "extract": lambda texts: set().union(*(extractor.extract(text) for text in texts)),
+        "extract_batch": extractor.extract_batch,
+    }
+
+    results = {}
+    for corpus_name, texts in corpora().items():
+        size = sum(len(text) for text in texts) / 1e6
+        reference = None
+        for name, extract in implementations.items():
+            elapsed, emails = run_case(extract, texts)
+            if reference is None:
+                reference = emails
+            elif emails != reference:
+                print(f"{corpus_name}/{name}: results differ from legacy")
+                sys.exit(1)
+            results[f"{corpus_name}/{name}"] = size / elapsed
+            print(f"{corpus_name + '/' + name:<24} {len(emails) / elapsed:12.0f} emails/s  {size / elapsed:10.2f} MB/s  ({len(emails)} emails)")
+
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent = 4)
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = [case for case, rate in results.items() if case in baseline and rate < baseline[case] * TOLERANCE]
+        for case in regressions:
+            print(f"Regression in {case}: {results[case]:.2f} MB/s vs {baseline[case]:.2f}")
+        sys.exit(1 if regressions else 0)
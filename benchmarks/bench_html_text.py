@@ -0,0 +1,44 @@
+"""
+Compares the BeautifulSoup get_text() path with the streaming TextExtractor.
+
+    python -m benchmarks.bench_html_text [saved_pages_dir]
+"""
+import sys
+import time
+import tracemalloc
+
+from bs4 import BeautifulSoup
+
+from benchmarks.corpus import load_pages
+from util.htmltext import TextExtractor
+
+
+def soup_text(html: str) -> str:
+    return BeautifulSoup(html, 'html.parser').get_text()
+
+
+def streamed_text(html: str, chunk_size: int = 16384) -> str:
+    extractor = TextExtractor()
+    for i in range(0, len(html), chunk_size):
+        extractor.feed(html[i:i + chunk_size])
+    extractor.close()
+    return extractor.get_text()
+
+
+def measure(name: str, extract, pages: list[str]):
+    tracemalloc.start()
+    start = time.perf_counter()
+    chars = sum(len(extract(page)) for page in pages)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    size = sum(len(page) for page in pages) / 1e6
+    print(f"{name:<16} {elapsed:8.3f} s  {size / elapsed:8.2f} MB/s  peak {peak / 1e6:8.1f} MB  {chars} chars of text")
+
+
+if __name__ == "__main__":
+    pages = load_pages(sys.argv[1] if len(sys.argv) > 1 else None)
+    print(f"{len(pages)} pages, {sum(len(page) for page in pages) / 1e6:.1f} MB")
+    measure("BeautifulSoup", soup_text, pages)
+    measure("TextExtractor", streamed_text, pages)
@@ -0,0 +1,100 @@
+"""
+Cover letter rendering throughput, in letters per second.
+
+    python -m benchmarks.bench_lmformatter [template.pdf] [--letters 200] [--processes 4]
+
+A single-page template is generated when none is given.
+"""
+import os
+import time
+import random
+import logging
+import argparse
+import tempfile
+from io import BytesIO
+from datetime import datetime
+
+from PyPDF2 import PdfReader, PdfWriter
+from reportlab.pdfgen import canvas
+from reportlab.lib.pagesizes import letter
+from reportlab.lib.styles import getSampleStyleSheet
+from reportlab.platypus import Paragraph
+
+from benchmarks.corpus import sentence
+from util.lmformatter import LMFormatter
+
+
+def make_template(path: str):
+    can = canvas.Canvas(path, pagesize=letter)
+    can.setFont("Helvetica-Bold", 14)
+    can.drawString(70, 740, "Jean Dupont")
+    can.setFont("Helvetica", 10)
+    for i, line in enumerate(["12 rue de la Paix", "75002 Paris", "jean.dupont@example.fr"]):
+        can.drawString(70, 722 - 14 * i, line)
+    can.line(70, 670, letter[0] - 70, 670)
+    can.save()
+
+
+def legacy_format_to_pdf(template_path: str, text: str) -> bytes:
+    """
+    LMFormatter.format_to_pdf as it was before the template and style were kept around.
+    """
+    reader = PdfReader(template_path)
+    writer = PdfWriter()
+    packet = BytesIO()
+    can = canvas.Canvas(packet, pagesize=letter)
+    style = getSampleStyleSheet()["BodyText"]
+    style.fontName = "Helvetica"
+    style.fontSize = 10
+    style.leading = 12
+    style.alignment = 4
+    margin = 70
+    paragraph = Paragraph(text.replace("\n", "<br/>"), style)
+    paragraph.wrapOn(can, letter[0] - 2 * margin, letter[1] - 2 * margin)
+    paragraph.drawOn(can, margin - 10, letter[1] - margin - paragraph.height - 120)
+    can.setFont("Helvetica-Bold", 10.5)
+    can.drawString(490, 773, datetime.now().strftime("%d/%m/%Y"))
+    can.save()
+    packet.seek(0)
+    new_pdf = PdfReader(packet)
+    for page in reader.pages:
+        page.merge_page(new_pdf.pages[0])
+        writer.add_page(page)
+    output = BytesIO()
+    writer.write(output)
+    return output.getvalue()
+
+
+def letters(count: int) -> list[str]:
+    rng = random.Random(2)
+    return ["\n\n".join(sentence(rng, rng.randint(40, 90)) for _ in range(4)) for _ in range(count)]
+
+
+def measure(name: str, render, texts: list[str]):
+    start = time.perf_counter()
+    render(texts)
+    elapsed = time.perf_counter() - start
+    print(f"{name:<28} {len(texts) / elapsed:8.1f} letters/s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("template", nargs = "?")
+    parser.add_argument("--letters", type = int, default = 200)
+    parser.add_argument("--processes", type = int, default = os.cpu_count())
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+
+    template_path = args.template
+    if template_path is None:
+        template_path = os.path.join(tempfile.mkdtemp(), "template.pdf")
+        make_template(template_path)
+
+    texts = letters(args.letters)
+    formatter = LMFormatter(template_path)
+
+    measure("legacy", lambda texts: [legacy_format_to_pdf(template_path, text) for text in texts], texts)
+    measure("format_to_pdf", lambda texts: [formatter.format_to_pdf(text) for text in texts], texts)
+    for processes in sorted({2, args.processes}):
+        if processes > 1:
+            measure(f"format_many ({processes} processes)", lambda texts: formatter.format_many(texts, processes = processes), texts)
@@ -0,0 +1,54 @@
+"""
+Page parsing and email extraction throughput, in the fetch thread vs. a ParsePool.
+
+    python -m benchmarks.bench_parse_pool [saved_pages_dir] [--count 400] [--chunk-size 8] [--max-processes N]
+
+Runs the pool with 1, 2, 4, ... processes up to --max-processes (default: CPU count) and
+checks that every run returns the same email sets as the in-thread path.
+"""
+import os
+import sys
+import time
+import argparse
+
+from benchmarks.corpus import load_pages
+from benchmarks.bench_emails import BLACKLIST
+from util.extractor import EmailExtractor
+from util.htmltext import html_to_text
+from util.parsepool import ParsePool
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("directory", nargs = "?")
+    parser.add_argument("--count", type = int, default = 400)
+    parser.add_argument("--chunk-size", type = int, default = 8)
+    parser.add_argument("--max-processes", type = int, default = os.cpu_count())
+    args = parser.parse_args()
+
+    pages = load_pages(args.directory, count = args.count)
+    megabytes = sum(len(page) for page in pages) / 1e6
+    print(f"{len(pages)} pages, {megabytes:.1f} MB, {os.cpu_count()} CPUs")
+
+    extractor = EmailExtractor(BLACKLIST)
+    start = time.perf_counter()
+    expected = [extractor.extract(html_to_text(page)) for page in pages]
+    baseline = time.perf_counter() - start
+    print(f"{'in thread':<14} {len(pages) / baseline:>8.0f} pages/s {megabytes / baseline:>6.1f} MB/s")
+
+    processes = 1
+    mismatches = 0
+    while processes <= max(args.max_processes, 1):
+        pool = ParsePool(BLACKLIST, processes, args.chunk_size)
+        pool.extract_many(pages[:processes]) # start the workers outside the timing
+        start = time.perf_counter()
+        found = pool.extract_many(pages)
+        elapsed = time.perf_counter() - start
+        pool.close()
+
+        mismatches += found != expected
+        print(f"{f'{processes} processes':<14} {len(pages) / elapsed:>8.0f} pages/s {megabytes / elapsed:>6.1f} MB/s"
+              f"  x{baseline / elapsed:.2f}{'' if found == expected else '  MISMATCH'}")
+        processes *= 2
+
+    sys.exit(1 if mismatches else 0)
@@ -0,0 +1,142 @@
+"""
+End-to-end throughput of the whole pipeline, offline, against the stand-ins of benchmarks.standins.
+
+    python -m benchmarks.bench_pipeline [--companies 50] [--llm-latency 0.5] [--site-latency 0.02]
+                                        [--smtp-latency 0.05] [--sheets-latency 0.3] [--save results.json] [--compare results.json]
+
+main.py's "run" command is executed non-interactively in a temporary directory, with fresh
+caches, against a site farm, an OpenAI-compatible stub, SMTP/IMAP servers, a nameserver and a fake worksheet.
+Reports applications per minute and the per-stage timings recorded by util.metrics.
+--compare exits with status 1 when applications per minute drop more than 20% below the saved results.
+"""
+import io
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+import tempfile
+import contextlib
+
+from benchmarks.bench_lmformatter import make_template
+from benchmarks.standins import SiteFarm, OpenAIStub, MailServer, DNSServer, FakeWorksheet
+
+TOLERANCE = 0.8
+
+CONFIG = """[config]
+gmail_adress = "me@example.fr"
+gmail_app_password = "password"
+display_name = "Jean Dupont"
+smtp_host = "127.0.0.1"
+smtp_port = {smtp_port}
+smtp_starttls = false
+imap_host = "127.0.0.1"
+imap_port = {imap_port}
+imap_ssl = false
+state_path = "state.sqlite"
+report_dir = "reports"
+
+[openai]
+openai_base_url = "{openai_base_url}"
+openai_api_key = "stub"
+lm_first_part = "Jean Dupont\\n12 rue de la Paix, Paris"
+lm_prompt = "Entreprise : {{COMPANY_INFO}}\\nCandidat : {{USER_INFO}}\\nDébut : {{FIRST_PART}}"
+lm_system_instructions = "Écris la suite de la lettre de motivation."
+llm_cache_path = "llm.sqlite"
+
+[email]
+subject = "Candidature spontanée"
+body = "Bonjour,\\nVeuillez trouver ma candidature ci-jointe."
+recipients_cache_path = "sent_recipients.json"
+mx_cache_path = "mx.sqlite"
+mx_nameservers = "127.0.0.1"
+mx_port = {dns_port}
+
+[pdf]
+cv_path = "{template_path}"
+lm_template_path = "{template_path}"
+lm_output_path = "LM.pdf"
+
+[scraper]
+google_query = "stand-in"
+email_blacklist = "noreply"
+cache_path = "http.sqlite"
+homepage_url = "{homepage_url}"
+
+[drive]
+google_sheets_name = "stand-in"
+google_sheets_creds_path = "unused.json"
+"""
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--companies", type = int, default = 50)
+    parser.add_argument("--llm-latency", type = float, default = 0.5)
+    parser.add_argument("--site-latency", type = float, default = 0.02)
+    parser.add_argument("--smtp-latency", type = float, default = 0.05)
+    parser.add_argument("--sheets-latency", type = float, default = 0.3)
+    parser.add_argument("--save")
+    parser.add_argument("--compare")
+    args = parser.parse_args()
+    save_path = os.path.abspath(args.save) if args.save else None
+    compare_path = os.path.abspath(args.compare) if args.compare else None
+
+    farm = SiteFarm(args.companies, latency = args.site_latency)
+    llm = OpenAIStub(latency = args.llm_latency, jitter = args.llm_latency / 4)
+    mail = MailServer(latency = args.smtp_latency)
+    worksheet = FakeWorksheet(latency = args.sheets_latency)
+    dns = DNSServer({domain: {"MX": [(10, f"mx.{domain}")]} for domain in farm.domains})
+
+    directory = tempfile.mkdtemp(prefix = "pyapplier-bench-")
+    os.chdir(directory)
+    make_template("template.pdf")
+    with open("config.ini", "w", encoding="utf-8") as f:
+        f.write(CONFIG.format(
+            smtp_port = mail.smtp_port,
+            imap_port = mail.imap_port,
+            dns_port = dns.port,
+            openai_base_url = llm.base_url,
+            homepage_url = farm.homepage_url,
+            template_path = os.path.join(directory, "template.pdf")
+        ))
+
+    logging.basicConfig(level = logging.WARNING)
+    import main
+    from util.config import Config
+    from util.metrics import metrics
+
+    main.ask_before_applying = False
+    main.open_before_applying = False
+    main.log_to_spreadsheet = True
+
+    pipeline = main.Pipeline(Config("config.ini"))
+    pipeline.scraper.get_search_results = farm.search_results
+    farm.route(pipeline.scraper.session)
+    pipeline.sheets._sheet = worksheet
+
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        main.run_command(pipeline, "run")
+        pipeline.close()
+    elapsed = time.perf_counter() - start
+
+    sent = len(mail.messages)
+    results = {"applications_per_minute": sent / elapsed * 60}
+    results.update({f"{name}_p50": timer["p50"] for name, timer in metrics.snapshot()["timers"].items()})
+
+    print(f"{sent}/{args.companies} applications sent in {elapsed:.1f}s: {results['applications_per_minute']:.1f} applications/minute")
+    print(f"{llm.requests} LLM requests, {len(worksheet.rows)} rows logged in {worksheet.requests} Sheets requests, report in {directory}/reports\n")
+    print(metrics.format())
+
+    if save_path:
+        with open(save_path, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent = 4)
+
+    if compare_path:
+        with open(compare_path, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        if results["applications_per_minute"] < baseline["applications_per_minute"] * TOLERANCE:
+            print(f"Regression: {results['applications_per_minute']:.1f} applications/minute vs {baseline['applications_per_minute']:.1f}")
+            sys.exit(1)
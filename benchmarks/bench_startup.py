@@ -0,0 +1,80 @@
+"""
+Startup cost of the util modules and of the CLI, measured with python -X importtime.
+
+    python -m benchmarks.bench_startup [--repeat 5] [--top 10] [--save results.json] [--compare results.json]
+
+Each module is imported in a fresh interpreter and its cumulative import time is read
+from the -X importtime report (best of --repeat runs). "all modules" is the wall time of
+importing them together, minus the time of an empty interpreter. The heaviest top-level
+imports are listed to show what is left to defer. --compare prints the change against
+saved results.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import subprocess
+
+MODULES = ["util.scraper", "util.lmwriter", "util.lmformatter", "util.sheets", "util.emailer", "util.router"]
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def import_times(statement: str) -> dict[str, int]:
+    """
+    Runs statement in a fresh interpreter and returns module -> cumulative import time in µs.
+    """
+    output = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", statement],
+        cwd = ROOT, capture_output = True, text = True
+    ).stderr
+    times = {}
+    for line in output.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line.removeprefix("import time:").split("|")
+        times[name.strip()] = int(cumulative)
+    return times
+
+
+def wall_time(arguments: list[str]) -> float:
+    start = time.perf_counter()
+    subprocess.run([sys.executable] + arguments, cwd = ROOT, capture_output = True)
+    return time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type = int, default = 5)
+    parser.add_argument("--top", type = int, default = 10)
+    parser.add_argument("--save")
+    parser.add_argument("--compare")
+    args = parser.parse_args()
+
+    results = {}
+    for module in MODULES:
+        results[module] = min(import_times(f"import {module}").get(module, 0) for _ in range(args.repeat)) / 1000
+    statement = "; ".join(f"import {module}" for module in MODULES)
+    everything = [import_times(statement) for _ in range(args.repeat)]
+    interpreter = min(wall_time(["-c", "pass"]) for _ in range(args.repeat))
+    results["all modules"] = (min(wall_time(["-c", statement]) for _ in range(args.repeat)) - interpreter) * 1000
+    if os.path.exists(os.path.join(ROOT, "main.py")):
+        results["main.py --help"] = min(wall_time(["main.py", "--help"]) for _ in range(args.repeat)) * 1000
+
+    baseline = {}
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+
+    for name, milliseconds in results.items():
+        change = f"  (was {baseline[name]:.1f} ms)" if name in baseline else ""
+        print(f"{name:<20} {milliseconds:8.1f} ms{change}")
+
+    print(f"\nHeaviest imports when importing every module:")
+    heaviest = sorted(everything[-1].items(), key = lambda item: item[1], reverse = True)
+    for name, microseconds in [item for item in heaviest if "." not in item[0]][:args.top]:
+        print(f"{name:<20} {microseconds / 1000:8.1f} ms")
+
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent = 4)
@@ -0,0 +1,65 @@
+"""
+Fixed page corpora shared by the benchmarks.
+
+Saved pages (*.html) are read from a directory when one is given, otherwise a
+deterministic synthetic corpus is generated so that numbers stay comparable between runs.
+"""
+import os
+import glob
+import random
+
+WORDS = (
+    "entreprise développement logiciel agence web équipe projet client solution innovation "
+    "digitale produit service contact recrutement stage alternance carrière lyon paris nantes "
+    "bordeaux toulouse startup données cloud mobile application conseil expertise technologie"
+).split()
+
+EMAIL_LOCAL_PARTS = ["contact", "jobs", "rh", "hello", "recrutement", "info", "support", "12contact", "Jean.Dupont", "dpo"]
+TLDS = ["fr", "com", "io", "dev", "tech", "net", "org", "de"]
+
+
+def sentence(rng: random.Random, length: int) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(length)).capitalize() + "."
+
+
+def email(rng: random.Random, index: int) -> str:
+    return f"{rng.choice(EMAIL_LOCAL_PARTS)}@company{index % 97}.{rng.choice(TLDS)}"
+
+
+def synthetic_page(rng: random.Random, index: int, paragraphs: int) -> str:
+    """
+    Builds a page shaped like a typical company homepage: navigation, inline scripts
+    and styles, content sections, a cookie banner and a footer.
+    """
+    script = "var config = {" + ",".join(f'"k{i}": "{sentence(rng, 3)}"' for i in range(40)) + "};"
+    style = " ".join(f".c{i} {{ margin: {i}px; color: #{i:06x}; }}" for i in range(60))
+    nav = "".join(f'<li><a href="/p{i}">{rng.choice(WORDS)}</a></li>' for i in range(12))
+    sections = "".join(
+        f"<section><h2>{sentence(rng, 3)}</h2><p>{sentence(rng, rng.randint(20, 80))}</p>"
+        + (f"<p>Écrivez-nous : {email(rng, index + i)}</p>" if i % 5 == 0 else "")
+        + "</section>"
+        for i in range(paragraphs)
+    )
+    return (
+        f"<!DOCTYPE html><html><head><title>Company {index}</title>"
+        f"<style>{style}</style><script>{script}</script></head><body>"
+        f"<header><nav><ul>{nav}</ul></nav></header><main>{sections}</main>"
+        f'<div id="cookie-banner" class="cookie-consent"><p>{sentence(rng, 30)}</p><button>Accepter</button></div>'
+        f"<footer><p>{sentence(rng, 15)}</p><p>{email(rng, index)}</p></footer>"
+        f"<script>{script}</script></body></html>"
+    )
+
+
+def load_pages(directory: str = None, count: int = 60, seed: int = 0) -> list[str]:
+    """
+    Returns the saved pages of directory, or count synthetic pages of varying size.
+    """
+    if directory:
+        pages = []
+        for path in sorted(glob.glob(os.path.join(directory, "*.html"))):
+            with open(path, "r", encoding="utf-8", errors="replace") as f:
+                pages.append(f.read())
+        return pages
+
+    rng = random.Random(seed)
+    return [synthetic_page(rng, i, rng.choice([5, 20, 80, 400])) for i in range(count)]
@@ -0,0 +1,352 @@
+"""
+Local stand-ins for the services the pipeline talks to, for offline benchmarks.
+
+ - SiteFarm: company websites served over HTTP, and the search results pointing at them
+ - OpenAIStub: an OpenAI-compatible /v1/chat/completions endpoint with configurable latency
+ - MailServer: SMTP and IMAP servers sharing one Sent mailbox
+ - DNSServer: a UDP nameserver answering MX and A queries from a table
+ - FakeWorksheet: the part of a gspread worksheet Sheets uses
+
+Every server listens on an ephemeral port of 127.0.0.1 only and runs in daemon threads.
+The site farm is reached as an HTTP proxy, so that each site keeps its own host name.
+"""
+import re
+import json
+import time
+import base64
+import random
+import threading
+import socket
+import struct
+import socketserver
+from types import SimpleNamespace
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+from benchmarks.corpus import sentence
+
+
+def serve(server) -> int:
+    threading.Thread(target = server.serve_forever, daemon = True).start()
+    return server.server_address[1]
+
+
+class SiteFarm:
+    def __init__(self, companies: int = 50, latency: float = 0.02, seed: int = 0):
+        """
+        Serves one homepage per company at http://www.<domain>/, each listing a contact address.
+        Requests reach the farm through proxy_url and are routed by their Host header.
+        """
+        rng = random.Random(seed)
+        self.latency = latency
+        self.domains = [f"company{i}.fr" for i in range(companies)]
+        self.pages = {
+            domain: (
+                f"<html><head><title>{domain}</title><meta name=\"description\" content=\"{sentence(rng, 12)}\"></head>"
+                f"<body><nav><a href=\"/\">Accueil</a></nav><main>"
+                + "".join(f"<p>{sentence(rng, rng.randint(20, 60))}</p>\n" for _ in range(rng.randint(3, 12)))
+                + f"<p>Contact : recrutement@{domain}</p>\n</main><footer>{sentence(rng, 8)}</footer></body></html>"
+            ).encode("utf-8")
+            for domain in self.domains
+        }
+        farm = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                time.sleep(farm.latency)
+                host = (self.headers.get("Host") or "").split(":")[0].lower()
+                page = farm.pages.get(host.removeprefix("www."))
+                if page is None:
+                    self.send_error(404)
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", "text/html; charset=utf-8")
+                self.send_header("Content-Length", str(len(page)))
+                self.end_headers()
+                self.wfile.write(page)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        self.port = serve(self.server)
+
+    @property
+    def proxy_url(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+    @property
+    def homepage_url(self) -> str:
+        return "http://www.{domain}/"
+
+    def route(self, session):
+        """
+        Sends the plain HTTP requests of a requests session to the farm, whatever the proxy environment.
+        """
+        session.trust_env = False
+        session.proxies = {"http": self.proxy_url}
+
+    def search_results(self):
+        """
+        Stands in for Scraper.get_search_results: one result per company, each on its own host.
+        """
+        for domain in self.domains:
+            yield SimpleNamespace(url = f"http://www.{domain}/", title = domain, description = "")
+
+    def close(self):
+        self.server.shutdown()
+
+
+class OpenAIStub:
+    def __init__(self, latency: float = 0.5, jitter: float = 0.2, tokens_per_second: float = 0):
+        """
+        Answers chat completions after latency ± jitter seconds. Streamed answers are sent
+        word by word, tokens_per_second apart (0 sends them at once).
+        """
+        self.latency = latency
+        self.jitter = jitter
+        self.tokens_per_second = tokens_per_second
+        self.requests = 0
+        self._lock = threading.Lock()
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self):
+                request = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                with stub._lock:
+                    stub.requests += 1
+                time.sleep(max(0.0, stub.latency + random.uniform(-stub.jitter, stub.jitter)))
+
+                prompt = request["messages"][-1]["content"]
+                words = min(request.get("max_tokens") or 200, 200)
+                content = f"Réponse à {len(prompt)} caractères. " + sentence(random.Random(prompt), words)
+                usage = {"prompt_tokens": len(prompt.split()), "completion_tokens": words, "total_tokens": len(prompt.split()) + words}
+                base = {"id": "chatcmpl-stub", "created": int(time.time()), "model": request["model"]}
+
+                if not request.get("stream"):
+                    body = json.dumps(dict(base, object = "chat.completion", usage = usage, choices = [
+                        {"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": content}}
+                    ])).encode("utf-8")
+                    self.send_response(200)
+                    self.send_header("Content-Type", "application/json")
+                    self.send_header("Content-Length", str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+                    return
+
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Connection", "close")
+                self.end_headers()
+                for word in content.split(" "):
+                    chunk = dict(base, object = "chat.completion.chunk", choices = [{"index": 0, "delta": {"content": word + " "}, "finish_reason": None}])
+                    self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+                    if stub.tokens_per_second:
+                        time.sleep(1 / stub.tokens_per_second)
+                if (request.get("stream_options") or {}).get("include_usage"):
+                    chunk = dict(base, object = "chat.completion.chunk", choices = [], usage = usage)
+                    self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+                self.wfile.write(b"data: [DONE]\n\n")
+                self.close_connection = True
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        self.port = serve(self.server)
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.port}/v1"
+
+    def close(self):
+        self.server.shutdown()
+
+
+class MailServer:
+    def __init__(self, latency: float = 0.05, uidvalidity: int = 1):
+        """
+        SMTP server accepting any login (AUTH PLAIN/LOGIN, no TLS) and an IMAP server exposing
+        every accepted message in a read-only "[Gmail]/Sent Mail" folder. Each message takes
+        latency seconds to be accepted.
+        """
+        self.latency = latency
+        self.uidvalidity = uidvalidity
+        self.messages = [] # (uid, recipients, data)
+        self._lock = threading.Lock()
+        mail = self
+
+        class SMTPHandler(socketserver.StreamRequestHandler):
+            def reply(self, line: str):
+                self.wfile.write((line + "\r\n").encode("ascii"))
+
+            def handle(self):
+                self.reply("220 localhost ESMTP stand-in")
+                recipients = []
+                while True:
+                    line = self.rfile.readline().decode("utf-8", "replace").rstrip("\r\n")
+                    if not line:
+                        return
+                    command = line.split(" ")[0].upper()
+                    if command in ("EHLO", "HELO"):
+                        self.reply("250-localhost")
+                        self.reply("250-AUTH PLAIN LOGIN")
+                        self.reply("250 8BITMIME")
+                    elif command == "AUTH":
+                        if line.upper().startswith("AUTH LOGIN"):
+                            self.reply("334 " + base64.b64encode(b"Username:").decode())
+                            self.rfile.readline()
+                            self.reply("334 " + base64.b64encode(b"Password:").decode())
+                            self.rfile.readline()
+                        self.reply("235 2.7.0 Authentication successful")
+                    elif command == "MAIL":
+                        recipients = []
+                        self.reply("250 OK")
+                    elif command == "RCPT":
+                        recipients.append(line.split(":", 1)[1].strip().strip("<>"))
+                        self.reply("250 OK")
+                    elif command == "DATA":
+                        self.reply("354 End data with <CR><LF>.<CR><LF>")
+                        lines = []
+                        while True:
+                            data = self.rfile.readline()
+                            if data in (b".\r\n", b".\n", b""):
+                                break
+                            lines.append(data[1:] if data.startswith(b"..") else data)
+                        time.sleep(mail.latency)
+                        with mail._lock:
+                            mail.messages.append((len(mail.messages) + 1, recipients, b"".join(lines)))
+                        self.reply("250 OK queued")
+                    elif command == "QUIT":
+                        self.reply("221 Bye")
+                        return
+                    elif command in ("RSET", "NOOP"):
+                        self.reply("250 OK")
+                    else:
+                        self.reply("502 Command not implemented")
+
+        class IMAPHandler(socketserver.StreamRequestHandler):
+            def send(self, line: str):
+                self.wfile.write((line + "\r\n").encode("utf-8"))
+
+            def handle(self):
+                self.send("* OK IMAP4rev1 stand-in ready")
+                while True:
+                    line = self.rfile.readline().decode("utf-8", "replace").rstrip("\r\n")
+                    if not line:
+                        return
+                    tag, command, *rest = line.split(" ", 2)
+                    command = command.upper()
+                    arguments = rest[0] if rest else ""
+                    with mail._lock:
+                        messages = list(mail.messages)
+
+                    if command == "CAPABILITY":
+                        self.send("* CAPABILITY IMAP4rev1")
+                    elif command in ("SELECT", "EXAMINE"):
+                        self.send(f"* {len(messages)} EXISTS")
+                        self.send(f"* OK [UIDVALIDITY {mail.uidvalidity}] UIDs valid")
+                        self.send(f"{tag} OK [READ-ONLY] {command} completed")
+                        continue
+                    elif command == "UID":
+                        subcommand, _, arguments = arguments.partition(" ")
+                        if subcommand.upper() == "SEARCH":
+                            first = int(re.search(r"UID (\d+):\*", arguments).group(1))
+                            uids = [uid for uid, _, _ in messages if uid >= first] or [uid for uid, _, _ in messages[-1:]]
+                            self.send("* SEARCH" + "".join(f" {uid}" for uid in uids))
+                        elif subcommand.upper() == "FETCH":
+                            first, last = (int(uid) for uid in arguments.split(" ")[0].split(":"))
+                            for sequence, (uid, recipients, _) in enumerate(messages, 1):
+                                if first <= uid <= last:
+                                    header = f"To: {', '.join(recipients)}\r\n\r\n".encode("utf-8")
+                                    self.wfile.write(f"* {sequence} FETCH (UID {uid} BODY[HEADER.FIELDS (TO)] {{{len(header)}}}\r\n".encode("ascii") + header + b")\r\n")
+                    elif command == "LOGOUT":
+                        self.send("* BYE")
+                        self.send(f"{tag} OK LOGOUT completed")
+                        return
+                    self.send(f"{tag} OK {command} completed")
+
+        self.smtp_server = socketserver.ThreadingTCPServer(("127.0.0.1", 0), SMTPHandler)
+        self.imap_server = socketserver.ThreadingTCPServer(("127.0.0.1", 0), IMAPHandler)
+        for server in (self.smtp_server, self.imap_server):
+            server.daemon_threads = True
+        self.smtp_port = serve(self.smtp_server)
+        self.imap_port = serve(self.imap_server)
+
+    def close(self):
+        self.smtp_server.shutdown()
+        self.imap_server.shutdown()
+
+
+class DNSServer:
+    TYPES = {1: "A", 15: "MX", 28: "AAAA"}
+
+    def __init__(self, records: dict, latency: float = 0.01, silent: set = ()):
+        """
+        Answers queries from records: {domain: {"MX": [(preference, exchange)], "A": [address]}}.
+        Domains missing from records get NXDOMAIN, known domains without the requested type an
+        empty answer, and domains in silent no answer at all (the resolver times out).
+        """
+        self.records = records
+        self.latency = latency
+        self.silent = set(silent)
+        self.queries = 0
+        self._lock = threading.Lock()
+        dns = self
+
+        class Handler(socketserver.BaseRequestHandler):
+            def handle(self):
+                data, sock = self.request
+                with dns._lock:
+                    dns.queries += 1
+                time.sleep(dns.latency)
+
+                labels, offset = [], 12
+                while data[offset]:
+                    labels.append(data[offset + 1:offset + 1 + data[offset]].decode("ascii"))
+                    offset += data[offset] + 1
+                question = data[12:offset + 5]
+                name = ".".join(labels).lower()
+                qtype = struct.unpack("!H", data[offset + 1:offset + 3])[0]
+                record_type = dns.TYPES.get(qtype)
+                if name in dns.silent:
+                    return
+
+                answers = []
+                if name in dns.records:
+                    for value in dns.records[name].get(record_type, []):
+                        if record_type == "MX":
+                            rdata = struct.pack("!H", value[0]) + b"".join(
+                                bytes([len(label)]) + label.encode("ascii") for label in value[1].split(".") if label
+                            ) + b"\0"
+                        else:
+                            rdata = socket.inet_pton(socket.AF_INET if record_type == "A" else socket.AF_INET6, value)
+                        answers.append(struct.pack("!HHHIH", 0xC00C, qtype, 1, 300, len(rdata)) + rdata)
+                rcode = 0 if name in dns.records else 3
+                header = data[:2] + struct.pack("!HHHHH", 0x8180 | rcode, 1, len(answers), 0, 0)
+                sock.sendto(header + question + b"".join(answers), self.client_address)
+
+        self.server = socketserver.ThreadingUDPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        self.port = serve(self.server)
+
+    def close(self):
+        self.server.shutdown()
+
+
+class FakeWorksheet:
+    def __init__(self, latency: float = 0.3):
+        """
+        Records appended rows, taking latency seconds per request like the Sheets API.
+        """
+        self.latency = latency
+        self.rows = []
+        self.requests = 0
+
+    def append_rows(self, rows, value_input_option = None):
+        time.sleep(self.latency)
+        self.requests += 1
+        self.rows.extend(rows)
@@ -3,109 +3,283 @@ ask_before_applying =  True
 open_before_applying = True
 
 from util.config import Config
-from util.emailer import Emailer
-from util.lmwriter import LMWriter
-from util.lmformatter import LMFormatter
-from util.scraper import Scraper
+from util.blacklist import Blacklist
+from util.state import PipelineState, reached
+from util.pipeline import Prefetcher
+from util.metrics import metrics
+from functools import cached_property
 import os
-import json
-
-if not os.path.exists("blacklist.json"):
-    blacklist = {
-        "emails": [],
-        "domains": []
-    }
-    with open("blacklist.json", "w+", encoding="utf-8") as f:
-        json.dump(blacklist, f, indent = 4)
-else:
-    with open("blacklist.json", "r", encoding="utf-8") as f:
-        blacklist = json.load(f)
-    
-
-if log_to_spreadsheet:
-    from util.sheets import Sheets
-
-if open_before_applying:
-    import webbrowser
-
-cfg = Config()
-emailer = Emailer(cfg)
-lm_writer = LMWriter(cfg)
-lm_formatter = LMFormatter(cfg)
-scraper = Scraper(cfg, num_results = 1000, max_emails = 1000, use_ai = True)
-sheets = Sheets(cfg)
-
-#----- DATA SCRAPING
-companies = {}
-emails = scraper.run()
-
-for email in emails:
-    domain = Scraper.domainFromEmail(email)
-    if domain not in companies:
-        companies[domain] = {"emails": []}
-    companies[domain]["emails"].append(email)
-
-for domain in companies.keys():
-    companies[domain]["info"] = scraper.getCompanyInfo(domain)
-
-print(companies)
-
-past_recipients = emailer.fetch_sent_recipients()
-
-if not companies:
-    print("No companies found.")
-else:
-    for domain_name, company in companies.items():
-        
-        recipient_email = company['emails'][0]
-        if recipient_email in past_recipients or recipient_email in blacklist["emails"]:
-            continue # skip since we already sent
+import logging
+import argparse
 
-        if open_before_applying:
-            webbrowser.open(f"https://www.{domain_name}")
-        
-        if ask_before_applying:
-            user_input = input(f"\n\n{company['info']}\nDo you want to send an application to {recipient_email} at {domain_name}? Y/N: ")
-
-            if user_input.lower() != 'y':
-                print(f"Skipping email to {recipient_email} at {domain_name} and added to blacklist")
-                blacklist["emails"].append(recipient_email)
-                blacklist["domains"].append(domain_name)
-                with open("blacklist.json", "w", encoding="utf-8") as f:
-                    json.dump(blacklist, f, indent = 4)
+
+class Pipeline:
+    def __init__(self, cfg: Config):
+        """
+        Everything a run needs, shared by the stage commands.
+        Clients are built the first time a stage uses them, so a command only imports
+        and authenticates what it needs (e.g. `status` never loads openai or reportlab).
+        """
+        self.cfg = cfg
+        self.state = PipelineState.from_config(cfg)
+        self.blacklist = Blacklist("blacklist.json")
+        self.final_stage = "logged" if log_to_spreadsheet else "sent"
+        self.save_lm_pdf = cfg.getboolean('save_lm_pdf', 'pdf', fallback = False)
+
+    @cached_property
+    def llm_cache(self):
+        from util.llmcache import LLMCache
+        return LLMCache.from_config(self.cfg)
+
+    @cached_property
+    def router(self):
+        from util.router import ModelRouter
+        return ModelRouter.from_config(self.cfg)
+
+    @cached_property
+    def crawl_index(self):
+        from util.crawlindex import CrawlIndex
+        return CrawlIndex.from_config(self.cfg)
+
+    @cached_property
+    def deliverability(self):
+        from util.deliverability import DeliverabilityChecker
+        return DeliverabilityChecker.from_config(self.cfg)
+
+    @cached_property
+    def scraper(self):
+        from util.scraper import Scraper
+        return Scraper(self.cfg, num_results = 1000, max_emails = 1000, use_ai = True, workers = 16, host_delay = 1.0, llm_cache = self.llm_cache, router = self.router, skip_domain = self.blacklist.has_domain, crawl_index = self.crawl_index)
+
+    @cached_property
+    def lm_writer(self):
+        from util.lmwriter import LMWriter
+        return LMWriter(self.cfg, llm_cache = self.llm_cache, router = self.router)
+
+    @cached_property
+    def lm_formatter(self):
+        from util.lmformatter import LMFormatter
+        return LMFormatter.from_config(self.cfg)
+
+    @cached_property
+    def emailer(self):
+        from util.emailer import Emailer
+        return Emailer(self.cfg)
+
+    @cached_property
+    def sheets(self):
+        from util.sheets import Sheets
+        return Sheets(self.cfg, on_written = self.logged)
+
+    #----- DATA SCRAPING
+    # every company found is checkpointed in the state store, so an interrupted run picks up where it stopped
+    def scrape(self):
+        def record_emails(emails):
+            for email in emails:
+                if self.blacklist.is_blocked(email):
+                    continue # checked before any summary is requested
+                self.state.add_emails(self.scraper.domainFromEmail(email), [email])
+
+        self.scraper.run(on_emails = record_emails)
+
+    def companies(self, since: str = None, skip_sent: bool = False) -> dict:
+        """
+        Returns the companies still to be processed, optionally only those that completed `since`.
+        With skip_sent, companies whose address is in the Sent folder are left out.
+        Companies whose domain can't receive mail are left out too, before anything is spent on them.
+        """
+        past_recipients = self.emailer.fetch_sent_recipients() if skip_sent else set()
+        companies = {}
+        for domain, company in self.state.pending(until = self.final_stage).items():
+            company["emails"] = [email for email in company["emails"] if not self.blacklist.is_blocked(email)]
+            if not company["emails"] or (since and not reached(company["stage"], since)):
                 continue
-        
-        print(f"Generating cover letter for {domain_name}")
-        
-        lm_text = lm_writer.generate_lm(
-            company_info = company['info'], 
-            save_to_file = False
-        )
-        
-        print(f"Generated LM: {lm_text}")
-        
-        # if ask_before_applying:
-        #     user_input = input(f"Do you want to send this to {recipient_email} at {domain_name}? Y/N: ")
-        #     if user_input.lower() != 'y':
-        #         print(f"Skipping LM email to {recipient_email} at {domain_name} and added to blacklist")
-        #         blacklist["emails"].append(recipient_email)
-        #         blacklist["domains"].append(domain_name)
-        #         with open("blacklist.json", "w", encoding="utf-8") as f:
-        #             json.dump(blacklist, f, indent = 4)
-        #         continue
-            
-        lm_formatter.format_to_pdf(
-            text = lm_text,
-            output_path = cfg.get('lm_output_path', 'pdf')
-        )
-        
-        emailer.send_email(
-            from_email = cfg.get('gmail_adress'),
-            to_email = recipient_email,
-            subject = cfg.get('subject', 'email'),
-            body = cfg.get('body', 'email'),
-            attachments = [cfg.get('cv_path', 'pdf'), cfg.get('lm_output_path', 'pdf')]
+            if company["emails"][0] in past_recipients and not reached(company["stage"], "sent"):
+                continue # skip since we already sent
+            companies[domain] = company
+
+        if self.deliverability is not None:
+            unsent = [domain for domain, company in companies.items() if not reached(company["stage"], "sent")]
+            for domain, deliverable in self.deliverability.check(unsent).items():
+                if not deliverable:
+                    del companies[domain] # would bounce
+        return companies
+
+    #----- PREPARATION
+    # summaries, draft letters and PDFs are prepared in background threads, a few companies ahead of the prompt
+    def summarize(self, domain_name, company):
+        if not reached(company["stage"], "summarized"):
+            company["info"] = self.scraper.getCompanyInfo(domain_name)
+            if company["info"]:
+                self.state.advance(domain_name, "summarized", info = company["info"])
+                company["stage"] = "summarized"
+        return company
+
+    def draft(self, domain_name, company):
+        if not reached(company["stage"], "generated"):
+            if not company["info"]:
+                # a letter written from nothing would be checkpointed and sent; the summary is retried next run
+                raise ValueError(f"no summary of {domain_name}")
+            company["letter"] = self.lm_writer.generate_lm(company_info = company["info"], save_to_file = False)
+            self.state.advance(domain_name, "generated", letter = company["letter"])
+            company["stage"] = "generated"
+        return company
+
+    def render(self, domain_name, company):
+        if not reached(company["stage"], "rendered"):
+            company["pdf"] = self.lm_formatter.format_to_pdf(
+                text = company["letter"],
+                output_path = self.lm_formatter.output_path_for(domain_name) if self.save_lm_pdf else None
+            )
+            self.state.advance(domain_name, "rendered", pdf = company["pdf"])
+            company["stage"] = "rendered"
+        return company
+
+    def prepare(self, companies: dict, stages: list[str]):
+        """
+        Runs companies through the given preparation stages in background threads.
+        Yields (domain, company, error) as each company comes out of the last stage.
+        """
+        # the clients are built here rather than by the first worker threads that need them:
+        # cached_property takes no lock from Python 3.12 on, so each thread could build its own
+        clients = {"summarize": "scraper", "draft": "lm_writer", "render": "lm_formatter"}
+        for stage in stages:
+            getattr(self, clients[stage])
+
+        workers = {"summarize": 4, "draft": self.lm_writer.concurrency if "draft" in stages else 1, "render": 1}
+        prefetcher = Prefetcher(
+            [(stage, getattr(self, stage), workers[stage]) for stage in stages],
+            lookahead = self.cfg.getint('prefetch_lookahead', fallback = 3)
         )
-        
+        return prefetcher.run(list(companies.items()))
+
+    #----- SENDING
+    def send(self, prepared):
+        """
+        Asks for approval of each prepared application, then sends and logs it.
+        """
+        if open_before_applying:
+            import webbrowser
+
+        for domain_name, company, error in prepared:
+            recipient_email = company['emails'][0]
+            if error is not None:
+                print(f"Skipping {domain_name}: preparing the application failed ({error})")
+                continue
+
+            if not reached(company['stage'], "sent"):
+                if open_before_applying:
+                    webbrowser.open(f"https://www.{domain_name}")
+
+                if ask_before_applying:
+                    user_input = input(f"\n\n{company['info']}\n\n{company['letter']}\n\nDo you want to send an application to {recipient_email} at {domain_name}? Y/N: ")
+
+                    if user_input.lower() != 'y':
+                        print(f"Skipping email to {recipient_email} at {domain_name} and added to blacklist")
+                        self.blacklist.add(email = recipient_email, domain = domain_name)
+                        continue
+                else:
+                    print(f"Generated LM: {company['letter']}")
+
+                self.emailer.send_email(
+                    from_email = self.cfg.get('gmail_adress'),
+                    to_email = recipient_email,
+                    subject = self.cfg.get('subject', 'email'),
+                    body = self.cfg.get('body', 'email'),
+                    attachments = [self.cfg.get('cv_path', 'pdf'), (os.path.basename(self.cfg.get('lm_output_path', 'pdf')), company['pdf'])]
+                )
+                self.state.advance(domain_name, "sent")
+                if self.crawl_index is not None:
+                    self.crawl_index.mark_contacted(domain_name) # later runs skip its search results
+
+            if log_to_spreadsheet:
+                self.sheets.log_email(domain_name, f"https://www.{domain_name}", recipient_email)
+
         if log_to_spreadsheet:
-            sheets.log_email(domain_name, f"https://www.{domain_name}", recipient_email)
\ No newline at end of file
+            self.sheets.flush()
+
+    def logged(self, rows):
+        """
+        Checkpoints the companies whose row reached the sheet (or its spill file).
+        Rows only buffered when the run stops are logged again by the next run.
+        """
+        for row in rows:
+            self.state.advance(row[0], "logged")
+
+    def close(self, report: bool = True):
+        """
+        Flushes and closes the clients that were built, then writes the run report
+        (timings and counters of every stage) to report_dir.
+        """
+        if "sheets" in self.__dict__:
+            self.sheets.close()
+        if "emailer" in self.__dict__:
+            self.emailer.close()
+        if "llm_cache" in self.__dict__:
+            print(f"LLM cache: {self.llm_cache.stats()}")
+        if self.__dict__.get("deliverability") is not None:
+            self.deliverability.close()
+        if self.__dict__.get("crawl_index") is not None:
+            print(f"Crawl index: {self.crawl_index.stats()}")
+            self.crawl_index.close()
+        self.blacklist.close()
+        self.state.close()
+
+        report_dir = self.cfg.get('report_dir', fallback = "reports")
+        if report and report_dir:
+            metrics.write_report(report_dir, self.cfg.get('prometheus_path', fallback = "") or None)
+            print(metrics.format())
+
+
+def drain(prepared):
+    for domain_name, company, error in prepared:
+        if error is not None:
+            print(f"{domain_name}: failed ({error})")
+
+
+def run_command(pipeline: Pipeline, command: str):
+    if command == "run":
+        pipeline.scrape()
+        companies = pipeline.companies(skip_sent = True)
+        if not companies:
+            print("No companies found.")
+        pipeline.send(pipeline.prepare(companies, ["summarize", "draft", "render"]))
+    elif command == "scrape":
+        pipeline.scrape()
+    elif command == "summarize":
+        drain(pipeline.prepare(pipeline.companies(), ["summarize"]))
+    elif command == "generate":
+        drain(pipeline.prepare(pipeline.companies(since = "summarized"), ["draft"]))
+    elif command == "render":
+        drain(pipeline.prepare(pipeline.companies(since = "generated"), ["render"]))
+    elif command == "send":
+        pipeline.send((domain, company, None) for domain, company in pipeline.companies(since = "rendered", skip_sent = True).items())
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = "Finds companies, writes them a cover letter and sends your application.")
+    parser.add_argument("--log-level", default = "INFO", help = "DEBUG, INFO, WARNING or ERROR (default: INFO)")
+    commands = parser.add_subparsers(dest = "command", metavar = "command")
+    commands.add_parser("run", help = "run every stage, asking before each application (default)")
+    commands.add_parser("scrape", help = "search for companies and collect their email addresses")
+    commands.add_parser("summarize", help = "summarize the homepage of every scraped company")
+    commands.add_parser("generate", help = "write a cover letter for every summarized company")
+    commands.add_parser("render", help = "render the PDF of every written cover letter")
+    commands.add_parser("send", help = "send the rendered applications, asking before each one")
+    commands.add_parser("status", help = "show how many companies reached each stage")
+    args = parser.parse_args()
+
+    # the util modules only log; the handlers and level of the whole run are set here
+    logging.basicConfig(
+        level = args.log_level.upper(),
+        format = '[%(asctime)s] [%(levelname)s] %(message)s',
+        datefmt = '%H:%M:%S'
+    )
+
+    pipeline = Pipeline(Config())
+    try:
+        run_command(pipeline, args.command or "run")
+        for stage, count in pipeline.state.counts().items():
+            print(f"{stage:<12} {count}")
+    finally:
+        pipeline.close(report = args.command != "status")
\ No newline at end of file
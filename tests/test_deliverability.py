@@ -0,0 +1,54 @@
+import pytest
+
+pytest.importorskip("dns.resolver")
+
+from benchmarks.standins import DNSServer
+from util.deliverability import DeliverabilityChecker
+
+
+@pytest.fixture
+def dns_server():
+    server = DNSServer({
+        "mx.fr": {"MX": [(10, "mail.mx.fr")]},
+        "a-only.fr": {"A": ["10.0.0.1"]},
+        "aaaa-only.fr": {"AAAA": ["::1"]},
+        "null-mx.fr": {"MX": [(0, ".")]},
+        "no-records.fr": {}
+    }, latency = 0, silent = {"silent.fr"})
+    yield server
+    server.close()
+
+
+@pytest.fixture
+def checker(tmp_path, dns_server):
+    checker = DeliverabilityChecker(str(tmp_path / "mx.sqlite"), nameservers = ["127.0.0.1"], port = dns_server.port, timeout = 0.5)
+    yield checker
+    checker.close()
+
+
+def test_check(checker):
+    assert checker.check(["mx.fr", "a-only.fr", "aaaa-only.fr", "null-mx.fr", "no-records.fr", "nxdomain.fr"]) == {
+        "mx.fr": True,
+        "a-only.fr": True,
+        "aaaa-only.fr": True,
+        "null-mx.fr": False,
+        "no-records.fr": False,
+        "nxdomain.fr": False
+    }
+
+
+def test_timeout_keeps_domain_uncached(checker):
+    assert checker.check(["silent.fr"]) == {"silent.fr": True}
+    assert checker.cached("silent.fr") is None
+
+
+def test_malformed_domains_do_not_abort_the_check(checker):
+    long_label = "a" * 64 + ".fr"
+    assert checker.check(["mx.fr", "foo..fr", long_label]) == {"mx.fr": True, "foo..fr": False, long_label: False}
+
+
+def test_answers_are_cached(checker, dns_server):
+    checker.check(["mx.fr", "nxdomain.fr"])
+    queries = dns_server.queries
+    assert checker.check(["mx.fr", "nxdomain.fr"]) == {"mx.fr": True, "nxdomain.fr": False}
+    assert dns_server.queries == queries
@@ -0,0 +1,31 @@
+from util.distill import distill
+
+PARAGRAPH = "ACME conçoit des logiciels de gestion pour les PME depuis 2010, depuis ses locaux de Lyon."
+
+
+def page(body: str, body_attributes: str = "") -> str:
+    return f"<html><head><title>ACME</title></head><body {body_attributes}>{body}</body></html>"
+
+
+def test_body_state_classes_keep_the_page():
+    html = page(f"<main><p>{PARAGRAPH}</p></main>", 'class="home page cookies-not-set"')
+    assert PARAGRAPH in distill(html)
+
+
+def test_attributes_match_whole_tokens():
+    html = page(f'<div class="has-menu"><p>{PARAGRAPH}</p></div><div class="mobile-menu-open"><p>Nos offres.</p></div>')
+    text = distill(html)
+    assert PARAGRAPH in text
+    assert "Nos offres." in text
+
+
+def test_boilerplate_is_dropped():
+    html = page(f'<div id="cookie-banner"><p>Nous utilisons des cookies pour améliorer votre expérience.</p></div><p>{PARAGRAPH}</p>')
+    text = distill(html)
+    assert PARAGRAPH in text
+    assert "cookies" not in text
+
+
+def test_falls_back_to_the_whole_text():
+    html = page(f'<div class="modal"><p>{PARAGRAPH}</p></div>')
+    assert PARAGRAPH in distill(html)
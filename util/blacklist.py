@@ -0,0 +1,105 @@
+import os
+import json
+import threading
+
+import logging
+logger = logging.getLogger(__name__)
+
+class Blacklist:
+    def __init__(self, path: str = "blacklist.json", compact_every: int = 1000):
+        """
+        Emails and domains that must not be contacted, held in sets for constant time lookups.
+        path keeps the usual {"emails": [...], "domains": [...]} snapshot. New entries are
+        appended to a journal next to it (path + ".journal") instead of rewriting the snapshot,
+        and the journal is folded back into the snapshot once it holds compact_every entries.
+        """
+        self.path = path
+        self.journal_path = path + ".journal"
+        self.compact_every = compact_every
+        self.emails = set()
+        self.domains = set()
+        self._journal_entries = 0
+        self._lock = threading.Lock()
+
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                snapshot = json.load(f)
+            self.emails.update(email.lower() for email in snapshot.get("emails", []))
+            self.domains.update(domain.lower() for domain in snapshot.get("domains", []))
+
+        if os.path.exists(self.journal_path):
+            with open(self.journal_path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue # line cut short by a crash
+                    self._apply(entry)
+                    self._journal_entries += 1
+
+        self._journal = open(self.journal_path, "a", encoding="utf-8")
+        if not os.path.exists(path) or self._journal_entries >= compact_every:
+            self.compact()
+        logger.info(f"Blacklist: {len(self.emails)} emails, {len(self.domains)} domains")
+
+    def _apply(self, entry: dict):
+        if entry.get("email"):
+            self.emails.add(entry["email"].lower())
+        if entry.get("domain"):
+            self.domains.add(entry["domain"].lower())
+
+    def has_email(self, email: str) -> bool:
+        return email.lower() in self.emails
+
+    def has_domain(self, domain: str) -> bool:
+        """
+        True if domain or one of its parent domains is blacklisted (www.example.com matches example.com).
+        """
+        labels = domain.lower().split(":")[0].split(".")
+        return any(".".join(labels[i:]) in self.domains for i in range(len(labels) - 1))
+
+    def is_blocked(self, email: str) -> bool:
+        """
+        True if the address itself or its domain is blacklisted.
+        """
+        return self.has_email(email) or self.has_domain(email.rpartition("@")[2])
+
+    def add(self, email: str = None, domain: str = None):
+        entry = {"email": email, "domain": domain}
+        with self._lock:
+            self._apply(entry)
+            self._journal.write(json.dumps(entry, ensure_ascii = False) + "\n")
+            self._journal.flush()
+            self._journal_entries += 1
+            if self._journal_entries >= self.compact_every:
+                self._compact()
+
+    def compact(self):
+        """
+        Writes the full blacklist to the snapshot and empties the journal.
+        """
+        with self._lock:
+            self._compact()
+
+    def _compact(self):
+        temporary_path = self.path + ".tmp"
+        with open(temporary_path, "w", encoding="utf-8") as f:
+            json.dump({"emails": sorted(self.emails), "domains": sorted(self.domains)}, f, indent = 4)
+        os.replace(temporary_path, self.path)
+        self._journal.truncate(0)
+        self._journal_entries = 0
+
+    def close(self):
+        self.compact()
+        self._journal.close()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO,
+        format='[%(asctime)s] [%(levelname)s] %(message)s',
+        datefmt='%H:%M:%S'
+    )
+    blacklist = Blacklist("blacklist.json")
+    print(blacklist.is_blocked("contact@example.com"))
+    blacklist.close()
@@ -1,11 +1,6 @@
 import configparser
 
 import logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='[%(asctime)s] [%(levelname)s] %(message)s',
-    datefmt='%H:%M:%S'
-)
 logger = logging.getLogger(__name__)
 
 class Config:
@@ -18,12 +13,33 @@ class Config:
         self.config = configparser.ConfigParser()
         self.config.read(config_file, "utf-8")
         
-    def get(self, key, section='config'):
+    def get(self, key, section='config', fallback=None):
+        """
+        Returns the unquoted value of key in section.
+        If fallback is given, it is returned instead of raising when the option is missing.
+        """
+        if fallback is not None and not self.config.has_option(section, key):
+            return fallback
         return self.config.get(section, key)\
             .removeprefix("\"")\
             .removesuffix("\"")\
             .strip()\
             .replace("\\n", "\n")
+
+    def getint(self, key, section='config', fallback=None):
+        return int(self.get(key, section, None if fallback is None else str(fallback)))
+
+    def getfloat(self, key, section='config', fallback=None):
+        return float(self.get(key, section, None if fallback is None else str(fallback)))
+
+    def getboolean(self, key, section='config', fallback=None):
+        value = self.get(key, section, None if fallback is None else str(fallback))
+        return value.lower() in ("1", "true", "yes", "on")
     
 if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO,
+        format='[%(asctime)s] [%(levelname)s] %(message)s',
+        datefmt='%H:%M:%S'
+    )
     config = Config()
\ No newline at end of file
@@ -0,0 +1,139 @@
+import os
+import json
+import time
+import sqlite3
+import threading
+
+import logging
+logger = logging.getLogger(__name__)
+
+class CrawlIndex:
+    def __init__(self, path: str = "cache/crawl.sqlite", recrawl_after: float = 30 * 86400):
+        """
+        Remembers across runs which URLs were fetched and what each domain yielded.
+        URLs fetched successfully less than recrawl_after seconds ago are not fetched again,
+        and search results on domains that were already mined or contacted are skipped altogether.
+        """
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok = True)
+
+        self.recrawl_after = recrawl_after
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread = False, timeout = 30)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS urls ("
+            "url TEXT PRIMARY KEY, fetched_at REAL, outcome TEXT)"
+        )
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS domains ("
+            "domain TEXT PRIMARY KEY, emails TEXT, contacted INTEGER, updated_at REAL)"
+        )
+        self._db.commit()
+
+    @classmethod
+    def from_config(cls, config):
+        """
+        Returns None if crawl_index_path is set to an empty string.
+        """
+        path = config.get('crawl_index_path', 'scraper', fallback = "cache/crawl.sqlite")
+        if not path:
+            return None
+        return cls(path, recrawl_after = config.getfloat('recrawl_days', 'scraper', fallback = 30) * 86400)
+
+    @staticmethod
+    def domain_of(host: str) -> str:
+        """
+        Normalizes a host or email domain: lowercase, without port or leading www.
+        """
+        return host.lower().split(":")[0].removeprefix("www.")
+
+    def is_exhausted(self, host: str) -> bool:
+        """
+        True if emails were already found on the domain of host, or if it was already contacted.
+        """
+        with self._lock:
+            row = self._db.execute(
+                "SELECT emails, contacted FROM domains WHERE domain = ?", (self.domain_of(host),)
+            ).fetchone()
+        return bool(row and (row[1] or json.loads(row[0])))
+
+    def is_fresh(self, url: str) -> bool:
+        """
+        True if url was fetched successfully less than recrawl_after seconds ago.
+        """
+        with self._lock:
+            row = self._db.execute(
+                "SELECT fetched_at FROM urls WHERE url = ? AND outcome = 'ok'", (url,)
+            ).fetchone()
+        return bool(row and time.time() - row[0] < self.recrawl_after)
+
+    def record_fetch(self, url: str, ok: bool):
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO urls (url, fetched_at, outcome) VALUES (?, ?, ?)",
+                (url, time.time(), "ok" if ok else "failed")
+            )
+            self._db.commit()
+
+    def add_emails(self, emails: set[str]):
+        """
+        Records emails under their domain.
+        """
+        by_domain = {}
+        for email in emails:
+            by_domain.setdefault(self.domain_of(email.rpartition("@")[2]), set()).add(email)
+
+        with self._lock:
+            for domain, found in by_domain.items():
+                row = self._db.execute("SELECT emails FROM domains WHERE domain = ?", (domain,)).fetchone()
+                known = set(json.loads(row[0])) if row else set()
+                self._db.execute(
+                    "INSERT INTO domains (domain, emails, contacted, updated_at) VALUES (?, ?, 0, ?) "
+                    "ON CONFLICT(domain) DO UPDATE SET emails = excluded.emails, updated_at = excluded.updated_at",
+                    (domain, json.dumps(sorted(known | found)), time.time())
+                )
+            self._db.commit()
+
+    def mark_contacted(self, domain: str):
+        with self._lock:
+            self._db.execute(
+                "INSERT INTO domains (domain, emails, contacted, updated_at) VALUES (?, '[]', 1, ?) "
+                "ON CONFLICT(domain) DO UPDATE SET contacted = 1, updated_at = excluded.updated_at",
+                (self.domain_of(domain), time.time())
+            )
+            self._db.commit()
+
+    def domain(self, domain: str) -> dict | None:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT emails, contacted, updated_at FROM domains WHERE domain = ?", (self.domain_of(domain),)
+            ).fetchone()
+        if row is None:
+            return None
+        return {"emails": json.loads(row[0]), "contacted": bool(row[1]), "updated_at": row[2]}
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "urls": self._db.execute("SELECT COUNT(*) FROM urls").fetchone()[0],
+                "domains": self._db.execute("SELECT COUNT(*) FROM domains").fetchone()[0],
+                "contacted": self._db.execute("SELECT COUNT(*) FROM domains WHERE contacted = 1").fetchone()[0]
+            }
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO,
+        format='[%(asctime)s] [%(levelname)s] %(message)s',
+        datefmt='%H:%M:%S'
+    )
+    import sys
+    index = CrawlIndex(sys.argv[1] if len(sys.argv) > 1 else "cache/crawl.sqlite")
+    for name, count in index.stats().items():
+        print(f"{name:<12} {count}")
@@ -0,0 +1,152 @@
+import os
+import time
+import sqlite3
+import threading
+from functools import cached_property
+from concurrent.futures import ThreadPoolExecutor
+from util.metrics import metrics
+
+import logging
+logger = logging.getLogger(__name__)
+
+class DeliverabilityChecker:
+    def __init__(self, path: str = "cache/mx.sqlite", ttl: float = 7 * 86400, nameservers: list[str] = None,
+                 port: int = 53, timeout: float = 5.0, workers: int = 16):
+        """
+        Tells whether domains can receive mail, from their DNS records:
+         - a domain with MX records can, unless its only MX is the null MX "." (RFC 7505)
+         - a domain without MX records can if it has an A or AAAA record (implicit MX, RFC 5321)
+         - a domain that does not exist can't, nor can a malformed one (e.g. "foo..fr")
+        Answers are cached for ttl seconds. Lookups that time out or find no nameserver
+        are not cached, and their domain is kept.
+        Queries go to the system resolver, or to nameservers on port if given.
+        """
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok = True)
+
+        self.ttl = ttl
+        self.nameservers = nameservers
+        self.port = port
+        self.timeout = timeout
+        self.workers = workers
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread = False, timeout = 30)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS domains ("
+            "domain TEXT PRIMARY KEY, deliverable INTEGER, checked_at REAL)"
+        )
+        self._db.commit()
+
+    @classmethod
+    def from_config(cls, config):
+        """
+        Returns None if mx_check is disabled.
+        """
+        if not config.getboolean('mx_check', 'email', fallback = True):
+            return None
+        nameservers = config.get('mx_nameservers', 'email', fallback = "")
+        return cls(
+            config.get('mx_cache_path', 'email', fallback = "cache/mx.sqlite"),
+            ttl = config.getfloat('mx_cache_ttl', 'email', fallback = 7 * 86400),
+            nameservers = nameservers.split() or None,
+            port = config.getint('mx_port', 'email', fallback = 53),
+            timeout = config.getfloat('mx_timeout', 'email', fallback = 5.0)
+        )
+
+    @cached_property
+    def resolver(self):
+        import dns.resolver
+        resolver = dns.resolver.Resolver(configure = not self.nameservers)
+        if self.nameservers:
+            resolver.nameservers = self.nameservers
+        resolver.port = self.port
+        resolver.lifetime = self.timeout
+        return resolver
+
+    def lookup(self, domain: str) -> bool | None:
+        """
+        Queries the DNS for domain. Returns None if no answer could be obtained.
+        """
+        import dns.resolver
+        import dns.exception
+        with metrics.timer("mx_lookup"):
+            try:
+                try:
+                    answer = self.resolver.resolve(domain, "MX")
+                    return any(str(record.exchange) != "." for record in answer)
+                except dns.resolver.NoAnswer:
+                    pass
+
+                for record_type in ("A", "AAAA"):
+                    try:
+                        self.resolver.resolve(domain, record_type)
+                        return True
+                    except dns.resolver.NoAnswer:
+                        pass
+                return False
+            except dns.resolver.NXDOMAIN:
+                return False
+            except (dns.resolver.NoNameservers, dns.exception.Timeout) as e:
+                metrics.increment("mx_lookup_failures")
+                logger.warning(f"Could not check {domain}: {e}")
+                return None
+            except (dns.exception.DNSException, ValueError) as e:
+                logger.warning(f"Invalid domain {domain!r}: {e}")
+                return False
+
+    def cached(self, domain: str) -> bool | None:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT deliverable, checked_at FROM domains WHERE domain = ?", (domain,)
+            ).fetchone()
+        if row is None or time.time() - row[1] > self.ttl:
+            return None
+        return bool(row[0])
+
+    def is_deliverable(self, domain: str) -> bool:
+        domain = domain.lower()
+        deliverable = self.cached(domain)
+        if deliverable is not None:
+            metrics.increment("mx_cache_hits")
+            return deliverable
+
+        deliverable = self.lookup(domain)
+        if deliverable is None:
+            return True # unknown, better an attempt than a lost company
+
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO domains (domain, deliverable, checked_at) VALUES (?, ?, ?)",
+                (domain, int(deliverable), time.time())
+            )
+            self._db.commit()
+        if not deliverable:
+            metrics.increment("undeliverable_domains")
+            logger.info(f"{domain} can't receive mail")
+        return deliverable
+
+    def check(self, domains: list[str]) -> dict[str, bool]:
+        """
+        Checks every domain, with up to `workers` lookups at a time.
+        """
+        if not domains:
+            return {}
+        with ThreadPoolExecutor(max_workers = min(self.workers, len(domains))) as executor:
+            return dict(zip(domains, executor.map(self.is_deliverable, domains)))
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO,
+        format='[%(asctime)s] [%(levelname)s] %(message)s',
+        datefmt='%H:%M:%S'
+    )
+    import sys
+    checker = DeliverabilityChecker()
+    for domain, deliverable in checker.check(sys.argv[1:]).items():
+        print(f"{domain:<32} {'ok' if deliverable else 'undeliverable'}")
@@ -0,0 +1,156 @@
+import re
+
+from util.htmltext import TextExtractor, html_to_text
+
+import logging
+logger = logging.getLogger(__name__)
+
+BOILERPLATE_TAGS = {"nav", "footer", "aside", "form", "button", "select", "svg", "iframe"}
+# matched against whole id/class tokens, which may extend the keyword with a plural or a suffix ("cookie-banner")
+BOILERPLATE_ATTRIBUTES = re.compile(
+    r"(?:cookies?|consent|gdpr|rgpd|newsletter|popup|modal|breadcrumbs?|menu|social|share)(?:[-_]\w[\w-]*)?",
+    re.IGNORECASE
+)
+# page wrappers often carry state classes such as "cookies-not-set", and must never be dropped
+WRAPPER_TAGS = {"html", "body", "main"}
+BLOCK_TAGS = {
+    "p", "div", "section", "article", "main", "header", "li", "ul", "ol", "table", "tr", "td", "th",
+    "h1", "h2", "h3", "h4", "h5", "h6", "br", "blockquote", "address", "dd", "dt"
+}
+VOID_TAGS = {"area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta", "source", "track", "wbr"}
+INFORMATIVE_WORDS = re.compile(
+    r"propos|qui sommes|entreprise|société|fondée|créée|équipe|mission|métier|clients?|expertise|"
+    r"spécialis|siège|basée?|situé|locaux|about|company|founded|team|based",
+    re.IGNORECASE
+)
+WORD = re.compile(r"\w+|[^\w\s]")
+
+_encoding = None
+
+
+def count_tokens(text: str) -> int:
+    """
+    Counts tokens with tiktoken's cl100k_base encoding when it is installed,
+    otherwise approximates them as words and punctuation marks.
+    """
+    global _encoding
+    if _encoding is None:
+        try:
+            import tiktoken
+            _encoding = tiktoken.get_encoding("cl100k_base")
+        except Exception:
+            _encoding = False
+    if _encoding:
+        return len(_encoding.encode(text, disallowed_special = ()))
+    return len(WORD.findall(text))
+
+
+class BlockExtractor(TextExtractor):
+    def __init__(self):
+        """
+        TextExtractor variant that keeps block boundaries as newlines and drops
+        navigation, footers and elements whose id/class look like cookie banners, menus, etc.
+        """
+        super().__init__()
+        self._stack = []
+        self.title = ""
+        self.description = ""
+
+    def handle_starttag(self, tag, attrs):
+        if tag in BLOCK_TAGS:
+            self._parts.append("\n")
+        if tag == "meta":
+            attrs = dict(attrs)
+            if (attrs.get("name") or "").lower() == "description" and not self.description:
+                self.description = attrs.get("content") or ""
+        if tag in VOID_TAGS:
+            return
+
+        skipped = tag in self.SKIPPED_TAGS or tag in BOILERPLATE_TAGS or (tag not in WRAPPER_TAGS and self.is_boilerplate(attrs))
+        self._stack.append((tag, skipped))
+        if skipped:
+            self._skip_depth += 1
+
+    @staticmethod
+    def is_boilerplate(attrs) -> bool:
+        tokens = " ".join(value for name, value in attrs if name in ("id", "class", "role") and value).split()
+        return any(BOILERPLATE_ATTRIBUTES.fullmatch(token) for token in tokens)
+
+    def handle_endtag(self, tag):
+        if tag in BLOCK_TAGS:
+            self._parts.append("\n")
+        if not any(open_tag == tag for open_tag, _ in self._stack):
+            return
+
+        # implicitly close the elements left open inside this one
+        while self._stack:
+            open_tag, skipped = self._stack.pop()
+            if skipped:
+                self._skip_depth -= 1
+            if open_tag == tag:
+                break
+
+    def handle_data(self, data):
+        if self._stack and self._stack[-1][0] == "title":
+            self.title += data
+        else:
+            super().handle_data(data)
+
+    def get_blocks(self) -> list[str]:
+        blocks = []
+        for line in self.get_text().split("\n"):
+            line = " ".join(line.split())
+            if line:
+                blocks.append(line)
+        return blocks
+
+
+def score(block: str) -> float:
+    """
+    Rates how much a block says about the company: longer prose and blocks
+    mentioning what the company does or where it is score higher.
+    """
+    words = block.split()
+    if len(words) < 4:
+        return 0.1
+    letters = sum(character.isalpha() for character in block) / len(block)
+    return min(len(words), 60) * letters * (1 + len(INFORMATIVE_WORDS.findall(block)))
+
+
+def distill(html: str, token_budget: int = 1500) -> str:
+    """
+    Reduces a page to its most informative text within token_budget tokens.
+    Boilerplate is removed, whitespace collapsed and repeated blocks dropped. The title
+    and meta description are kept first, then the best scoring blocks, in page order.
+    If no block survives the boilerplate removal, the blocks are taken from the whole visible text.
+    """
+    extractor = BlockExtractor()
+    extractor.feed(html)
+    extractor.close()
+
+    candidates = extractor.get_blocks()
+    if not candidates:
+        logger.debug("Nothing left after removing boilerplate, keeping the whole text")
+        candidates = [" ".join(line.split()) for line in html_to_text(html).split("\n") if line.strip()]
+
+    seen = set()
+    blocks = []
+    for block in candidates:
+        if block.lower() not in seen:
+            seen.add(block.lower())
+            blocks.append(block)
+
+    header = [" ".join(part.split()) for part in (extractor.title, extractor.description) if part.strip()]
+
+    selected = []
+    budget = token_budget - count_tokens("\n".join(header))
+    ranked = sorted(range(len(blocks)), key = lambda index: score(blocks[index]), reverse = True)
+    for index in ranked:
+        tokens = count_tokens(blocks[index]) + 1
+        if tokens <= budget:
+            selected.append(index)
+            budget -= tokens
+
+    text = "\n".join(header + [blocks[index] for index in sorted(selected)])
+    logger.debug(f"Distilled page to {count_tokens(text)} tokens ({len(selected)}/{len(blocks)} blocks)")
+    return text
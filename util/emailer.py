@@ -1,5 +1,8 @@
 import os
+import json
 import smtplib
+import threading
+from util.metrics import metrics
 import imaplib
 import email
 import email.encoders as encoders
@@ -8,11 +11,6 @@ from email.mime.text import MIMEText
 from email.mime.base import MIMEBase
 
 import logging
-logging.basicConfig(
-    level=logging.DEBUG,
-    format='[%(asctime)s] [%(levelname)s] %(message)s',
-    datefmt='%H:%M:%S'
-)
 logger = logging.getLogger(__name__)
 
 class Emailer:
@@ -22,9 +20,25 @@ class Emailer:
         self.display_name = config.get('display_name')
         self.smtp_host = config.get('smtp_host')
         self.smtp_port = config.get('smtp_port')
+        self.smtp_starttls = config.getboolean('smtp_starttls', fallback = True)
+        self.imap_host = config.get('imap_host', fallback = self.smtp_host)
+        self.imap_port = config.getint('imap_port', fallback = 993 if config.getboolean('imap_ssl', fallback = True) else 143)
+        self.imap_ssl = config.getboolean('imap_ssl', fallback = True)
+        self.recipients_cache_path = config.get('recipients_cache_path', 'email', fallback = "sent_recipients.json")
+        self.imap_batch_size = 500
 
-    def send_email(self, from_email, to_email, subject, body, attachments=None):
-        logger.info(f"Sending email from REDACTED to REDACTED with subject '{subject}'")
+        self.max_messages_per_connection = config.getint('smtp_messages_per_connection', 'email', fallback = 100)
+        self.send_attempts = 2
+        self._smtp = None
+        self._sent_on_connection = 0
+        self._lock = threading.Lock()
+        self._attachments = {}
+
+    def build_message(self, from_email, to_email, subject, body, attachments=None) -> MIMEMultipart:
+        """
+        Builds the MIME message of an application, with its PDF attachments.
+        Attachments are file paths, or (filename, bytes) tuples for PDFs held in memory.
+        """
         msg = MIMEMultipart()
         
         msg['From'] = f"{self.display_name} <{from_email}>"
@@ -34,51 +48,175 @@ class Emailer:
         
         if attachments:
             for attachment in attachments:
-                if not attachment.lower().endswith('.pdf'):
-                    logger.warning(f"Skipping non-PDF attachment: {attachment}")
+                in_memory = isinstance(attachment, tuple)
+                filename = attachment[0] if in_memory else attachment
+                if not filename.lower().endswith('.pdf'):
+                    logger.warning(f"Skipping non-PDF attachment: {filename}")
                     continue
-                with open(attachment, 'rb') as f:
-                    mime_attachment = MIMEBase('application', 'pdf')
-                    mime_attachment.set_payload(f.read())
-                    encoders.encode_base64(mime_attachment)
-                    filename = os.path.basename(attachment)
-                    mime_attachment.add_header('Content-Disposition', f'attachment; filename="{filename}"')
-                    mime_attachment.add_header('Content-Transfer-Encoding', 'base64')
+                if in_memory:
+                    msg.attach(self.pdf_part(*attachment))
+                else:
+                    msg.attach(self.load_attachment(attachment))
+
+        return msg
+
+    def load_attachment(self, path: str) -> MIMEBase:
+        """
+        Returns the base64-encoded MIME part of a PDF file.
+        Parts are cached by path and rebuilt only when the file's mtime or size changes,
+        so a CV attached to every application is read and encoded once.
+        """
+        stat = os.stat(path)
+        signature = (stat.st_mtime_ns, stat.st_size)
+        cached = self._attachments.get(path)
+        if cached and cached[0] == signature:
+            return cached[1]
 
-                    msg.attach(mime_attachment)
+        with open(path, 'rb') as f:
+            mime_attachment = self.pdf_part(os.path.basename(path), f.read())
 
+        self._attachments[path] = (signature, mime_attachment)
+        return mime_attachment
+
+    @staticmethod
+    def pdf_part(filename: str, data: bytes) -> MIMEBase:
+        mime_attachment = MIMEBase('application', 'pdf')
+        mime_attachment.set_payload(data)
+        encoders.encode_base64(mime_attachment)
+        mime_attachment.add_header('Content-Disposition', f'attachment; filename="{filename}"')
+        mime_attachment.add_header('Content-Transfer-Encoding', 'base64')
+        return mime_attachment
+
+    def connect(self):
+        """
+        Opens an authenticated SMTP connection, replacing the current one if any.
+        """
+        self.close()
+        logger.debug(f"Connecting to {self.smtp_host}:{self.smtp_port}")
+        smtp = smtplib.SMTP(self.smtp_host, self.smtp_port)
         try:
-            with smtplib.SMTP(self.smtp_host, self.smtp_port) as smtp:
+            if self.smtp_starttls:
                 smtp.starttls()
-                smtp.login(self.username, self.password)
-                smtp.sendmail(from_email, to_email, msg.as_string())
-            logger.info("Email sent successfully!")
-            return True
-        except Exception as e:
-            raise e
+            smtp.login(self.username, self.password)
+        except Exception:
+            smtp.close()
+            raise
+        self._smtp = smtp
+        self._sent_on_connection = 0
+
+    def close(self):
+        if self._smtp is None:
+            return
+        try:
+            self._smtp.quit()
+        except smtplib.SMTPException:
+            self._smtp.close()
+        except OSError:
+            pass
+        self._smtp = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    @staticmethod
+    def is_retryable(error: Exception) -> bool:
+        """
+        Tells whether a send failure is worth a new connection: dropped connections
+        and temporary (4xx) refusals such as per-connection message limits.
+        """
+        if isinstance(error, smtplib.SMTPRecipientsRefused):
+            return False
+        if isinstance(error, smtplib.SMTPResponseException):
+            return 400 <= error.smtp_code < 500
+        return isinstance(error, (smtplib.SMTPServerDisconnected, ConnectionError, TimeoutError))
+
+    @metrics.timed("smtp_send")
+    def send_message(self, from_email, to_email, msg: MIMEMultipart):
+        """
+        Sends a prepared message over the shared connection.
+        The connection is opened on first use, renewed every max_messages_per_connection
+        messages and transparently re-established once if the server drops it.
+        """
+        payload = msg.as_string()
+        with self._lock:
+            for attempt in range(self.send_attempts):
+                if self._smtp is None or self._sent_on_connection >= self.max_messages_per_connection:
+                    self.connect()
+                try:
+                    self._smtp.sendmail(from_email, to_email, payload)
+                    self._sent_on_connection += 1
+                    return True
+                except Exception as e:
+                    if attempt + 1 >= self.send_attempts or not self.is_retryable(e):
+                        raise
+                    logger.warning(f"SMTP connection lost ({e}), reconnecting")
+                    self.close()
+
+    def send_email(self, from_email, to_email, subject, body, attachments=None):
+        logger.info(f"Sending email from REDACTED to REDACTED with subject '{subject}'")
+        msg = self.build_message(from_email, to_email, subject, body, attachments)
+        self.send_message(from_email, to_email, msg)
+        logger.info("Email sent successfully!")
+        return True
+
+    def send_many(self, messages: list[dict]) -> list:
+        """
+        Sends many applications over the same connection.
+        Each item holds the keyword arguments of send_email; the result list holds,
+        in the same order, True or the exception that message raised.
+        """
+        results = []
+        for message in messages:
+            try:
+                results.append(self.send_email(**message))
+            except Exception as e:
+                logger.error(f"Failed to send email: {e}")
+                results.append(e)
+        return results
         
         
     def fetch_sent_recipients(self):
         """
         Fetches every past email recipient of the current account.
         Used to avoid contacting the same adress twice.
+        Only the To header of messages newer than the last synced UID is downloaded,
+        in batches of UID ranges. Recipients are cached on disk along with the mailbox
+        UIDVALIDITY, which invalidates the cache when it changes.
         """
         logging.info("Fetching past email recipients...")
+        cache = self.load_recipients_cache()
         try:
-            mail = imaplib.IMAP4_SSL(self.smtp_host)
+            mail = (imaplib.IMAP4_SSL if self.imap_ssl else imaplib.IMAP4)(self.imap_host, self.imap_port)
             mail.login(self.username, self.password)
-            mail.select('"[Gmail]/Sent Mail"')
+            mail.select('"[Gmail]/Sent Mail"', readonly = True)
 
-            result, data = mail.search(None, 'ALL')
-            email_ids = data[0].split()
+            uidvalidity = int(mail.response('UIDVALIDITY')[1][0])
+            if cache["uidvalidity"] != uidvalidity:
+                logger.info("Sent mailbox UIDVALIDITY changed, resyncing every recipient")
+                cache = {"uidvalidity": uidvalidity, "last_uid": 0, "recipients": []}
 
-            recipients = set()
-            for email_id in email_ids:
-                result, msg_data = mail.fetch(email_id, '(RFC822)')
-                raw_email = msg_data[0][1]
-                msg = email.message_from_bytes(raw_email)
-                if msg['To']:
-                    recipients.update([addr.strip() for addr in msg['To'].split(',')])
+            # "UID n:*" always matches the last message, even if its UID is below n
+            result, data = mail.uid('SEARCH', None, f'UID {cache["last_uid"] + 1}:*')
+            uids = [int(uid) for uid in data[0].split() if int(uid) > cache["last_uid"]]
+            logger.info(f"{len(uids)} new sent messages since last sync")
+
+            recipients = set(cache["recipients"])
+            for i in range(0, len(uids), self.imap_batch_size):
+                batch = uids[i:i + self.imap_batch_size]
+                result, msg_data = mail.uid('FETCH', f"{batch[0]}:{batch[-1]}", '(BODY.PEEK[HEADER.FIELDS (TO)])')
+                for part in msg_data:
+                    if not isinstance(part, tuple):
+                        continue
+                    msg = email.message_from_bytes(part[1])
+                    if msg['To']:
+                        recipients.update([addr.strip() for addr in msg['To'].split(',')])
+
+                cache["last_uid"] = batch[-1]
+                cache["recipients"] = sorted(recipients)
+                self.save_recipients_cache(cache)
 
             mail.logout()
             logging.debug(f"Past recipients: {recipients}")
@@ -86,11 +224,26 @@ class Emailer:
 
         except Exception as e:
             logger.error(f"An error occurred: {e}")
-            return set()
+            return set(cache["recipients"])
+
+    def load_recipients_cache(self) -> dict:
+        if os.path.exists(self.recipients_cache_path):
+            with open(self.recipients_cache_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        return {"uidvalidity": None, "last_uid": 0, "recipients": []}
+
+    def save_recipients_cache(self, cache: dict):
+        with open(self.recipients_cache_path, "w", encoding="utf-8") as f:
+            json.dump(cache, f, indent = 4)
 
         
         
 if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.DEBUG,
+        format='[%(asctime)s] [%(levelname)s] %(message)s',
+        datefmt='%H:%M:%S'
+    )
     from config import Config
     config = Config()
     logging.debug(config.get('lm_output_path', 'pdf'))
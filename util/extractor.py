@@ -0,0 +1,73 @@
+import re
+
+import logging
+logger = logging.getLogger(__name__)
+
+class EmailExtractor:
+    TLDS = ("com", "net", "org", "fr", "studio", "dev", "io", "tech")
+
+    def __init__(self, blacklist: list[str]):
+        """
+        Email extraction with every regular expression compiled once.
+        Blacklist words are joined into a single alternation, matched against each candidate.
+        """
+        self.email_regex = re.compile(
+            r'\b[a-z0-9._%+-]+@[a-zA-Z0-9.-]+\.(?:' + '|'.join(self.TLDS) + r')\b',
+            re.IGNORECASE
+        )
+        words = [word for word in blacklist if word]
+        self.blacklist_regex = re.compile('|'.join(words)) if words else None
+
+    @staticmethod
+    def is_valid_local_part(local_part: str) -> bool:
+        return local_part.islower() and local_part.replace('.', '').replace('_', '').isalnum()
+
+    def filter(self, candidates: set[str]) -> set[str]:
+        """
+        Drops blacklisted candidates and keeps lowercase alphanumeric local parts.
+        A local part starting with digits is also tried with the digits stripped.
+        """
+        valid_emails = set()
+        for email in candidates:
+            if self.blacklist_regex and self.blacklist_regex.search(email):
+                continue
+
+            local_part, domain = email.split('@', 1)
+            if self.is_valid_local_part(local_part):
+                valid_emails.add(email)
+
+            if local_part[0].isdigit():
+                local_part = local_part.lstrip('0123456789')
+                if self.is_valid_local_part(local_part):
+                    valid_emails.add(f"{local_part}@{domain}")
+
+        return valid_emails
+
+    @staticmethod
+    def candidate_tokens(text: str) -> str:
+        """
+        Keeps only the whitespace-separated tokens of text that contain an '@'.
+        An address never spans whitespace, so the regex finds the same matches
+        in this much shorter string.
+        """
+        if '@' not in text:
+            return ""
+        return " ".join(token for token in text.split() if '@' in token)
+
+    def extract(self, text: str) -> set[str]:
+        """
+        Extracts valid email addresses from text.
+        """
+        valid_emails = self.filter(set(self.email_regex.findall(self.candidate_tokens(text))))
+        logger.debug(f"Extracted {len(valid_emails)} valid emails from text")
+        return valid_emails
+
+    def extract_batch(self, texts: list[str]) -> set[str]:
+        """
+        Extracts valid email addresses from many texts in a single regex pass.
+        Texts are joined with newlines, which no address can span.
+        """
+        joined = "\n".join(self.candidate_tokens(text) for text in texts)
+        valid_emails = self.filter(set(self.email_regex.findall(joined)))
+        logger.debug(f"Extracted {len(valid_emails)} valid emails from {len(texts)} texts")
+        return valid_emails
@@ -0,0 +1,54 @@
+from html.parser import HTMLParser
+
+import logging
+logger = logging.getLogger(__name__)
+
+HTML_CONTENT_TYPES = ("text/html", "application/xhtml+xml", "text/plain")
+
+class TextExtractor(HTMLParser):
+    SKIPPED_TAGS = {"script", "style", "noscript", "template"}
+
+    def __init__(self):
+        """
+        Incremental HTML-to-text converter.
+        Chunks of markup can be fed as they arrive, text is collected without building
+        a tree and the content of script/style tags is dropped.
+        """
+        super().__init__(convert_charrefs = True)
+        self._parts = []
+        self._skip_depth = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in self.SKIPPED_TAGS:
+            self._skip_depth += 1
+
+    def handle_endtag(self, tag):
+        if tag in self.SKIPPED_TAGS and self._skip_depth:
+            self._skip_depth -= 1
+
+    def handle_data(self, data):
+        if not self._skip_depth:
+            self._parts.append(data)
+
+    def get_text(self) -> str:
+        return "".join(self._parts)
+
+
+def is_html(content_type: str) -> bool:
+    """
+    Tells whether a Content-Type header is worth extracting text from.
+    A missing header is given the benefit of the doubt.
+    """
+    if not content_type:
+        return True
+    return content_type.split(";")[0].strip().lower() in HTML_CONTENT_TYPES
+
+
+def html_to_text(html: str) -> str:
+    """
+    Returns the visible text of an HTML document.
+    """
+    extractor = TextExtractor()
+    extractor.feed(html)
+    extractor.close()
+    return extractor.get_text()
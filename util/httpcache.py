@@ -0,0 +1,98 @@
+import os
+import time
+import sqlite3
+import threading
+
+import logging
+logger = logging.getLogger(__name__)
+
+class ResponseCache:
+    def __init__(self, path: str = "cache/http.sqlite", ttl: float = 86400, max_age: float = 30 * 86400,
+                 max_bytes: int = 200 * 1024 * 1024):
+        """
+        Persistent cache of fetched pages, keyed by URL.
+        Entries younger than ttl seconds are served as-is, older ones keep their
+        ETag / Last-Modified validators so they can be revalidated with a conditional request.
+        Entries not fetched or revalidated for max_age seconds are deleted, and the oldest
+        ones are evicted once the cached pages exceed max_bytes.
+        """
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok = True)
+
+        self.ttl = ttl
+        self.max_age = max_age
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread = False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "url TEXT PRIMARY KEY, fetched_at REAL, etag TEXT, last_modified TEXT, body TEXT, size INTEGER)"
+        )
+        columns = [row[1] for row in self._db.execute("PRAGMA table_info(responses)")]
+        if "size" not in columns: # caches written before eviction existed
+            self._db.execute("ALTER TABLE responses ADD COLUMN size INTEGER")
+            self._db.execute("UPDATE responses SET size = LENGTH(CAST(body AS BLOB))")
+        self._evict()
+        self._db.commit()
+
+    def get(self, url: str) -> dict | None:
+        """
+        Returns the cached entry for url, or None.
+        The entry's 'fresh' key tells whether it can be used without revalidation.
+        """
+        with self._lock:
+            row = self._db.execute(
+                "SELECT fetched_at, etag, last_modified, body FROM responses WHERE url = ?", (url,)
+            ).fetchone()
+        if row is None:
+            return None
+
+        fetched_at, etag, last_modified, body = row
+        return {
+            "body": body,
+            "etag": etag,
+            "last_modified": last_modified,
+            "fresh": time.time() - fetched_at < self.ttl
+        }
+
+    def put(self, url: str, body: str, etag: str = None, last_modified: str = None):
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses (url, fetched_at, etag, last_modified, body, size) VALUES (?, ?, ?, ?, ?, ?)",
+                (url, time.time(), etag, last_modified, body, len(body.encode("utf-8")))
+            )
+            self._evict()
+            self._db.commit()
+
+    def _evict(self):
+        """
+        Deletes entries older than max_age, then the oldest ones until the cache fits in max_bytes.
+        """
+        expired = self._db.execute("DELETE FROM responses WHERE fetched_at < ?", (time.time() - self.max_age,)).rowcount
+        total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total <= self.max_bytes:
+            if expired:
+                logger.debug(f"Deleted {expired} expired HTTP cache entries")
+            return
+
+        evicted = 0
+        for url, size in self._db.execute("SELECT url, size FROM responses ORDER BY fetched_at").fetchall():
+            if total <= self.max_bytes:
+                break
+            self._db.execute("DELETE FROM responses WHERE url = ?", (url,))
+            total -= size
+            evicted += 1
+        logger.debug(f"Deleted {expired} expired and evicted {evicted} HTTP cache entries")
+
+    def touch(self, url: str):
+        """
+        Marks an entry as fresh again, after the server answered 304 Not Modified.
+        """
+        with self._lock:
+            self._db.execute("UPDATE responses SET fetched_at = ? WHERE url = ?", (time.time(), url))
+            self._db.commit()
+
+    def close(self):
+        with self._lock:
+            self._db.close()
@@ -0,0 +1,98 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from util.metrics import metrics
+
+import logging
+logger = logging.getLogger(__name__)
+
+class LLMCache:
+    def __init__(self, path: str = "cache/llm.sqlite", max_bytes: int = 50 * 1024 * 1024, bypass: bool = False):
+        """
+        Persistent, content-addressed cache of LLM completions.
+        Entries are keyed by a hash of the model, system instructions, prompt and sampling
+        parameters. Least recently used entries are evicted once the cached text exceeds
+        max_bytes. With bypass set, lookups always miss but fresh completions are still stored.
+        """
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok = True)
+
+        self.max_bytes = max_bytes
+        self.bypass = bypass
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread = False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS completions ("
+            "key TEXT PRIMARY KEY, value TEXT, size INTEGER, last_used REAL)"
+        )
+        self._db.commit()
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(
+            path = config.get('llm_cache_path', 'openai', fallback = "cache/llm.sqlite"),
+            max_bytes = config.getint('llm_cache_max_mb', 'openai', fallback = 50) * 1024 * 1024,
+            bypass = config.getboolean('llm_cache_bypass', 'openai', fallback = False)
+        )
+
+    @staticmethod
+    def make_key(model: str, instructions: str, prompt: str, **params) -> str:
+        payload = json.dumps([model, instructions, prompt, params], sort_keys = True, ensure_ascii = False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> str | None:
+        with self._lock:
+            row = None if self.bypass else self._db.execute(
+                "SELECT value FROM completions WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                metrics.increment("llm_cache_misses")
+                return None
+
+            self.hits += 1
+            metrics.increment("llm_cache_hits")
+            self._db.execute("UPDATE completions SET last_used = ? WHERE key = ?", (time.time(), key))
+            self._db.commit()
+            return row[0]
+
+    def put(self, key: str, value: str):
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO completions VALUES (?, ?, ?, ?)",
+                (key, value, len(value.encode("utf-8")), time.time())
+            )
+            self._evict()
+            self._db.commit()
+
+    def _evict(self):
+        """
+        Deletes least recently used entries until the cache fits in max_bytes.
+        """
+        total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM completions").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+
+        evicted = 0
+        for key, size in self._db.execute("SELECT key, size FROM completions ORDER BY last_used").fetchall():
+            if total <= self.max_bytes:
+                break
+            self._db.execute("DELETE FROM completions WHERE key = ?", (key,))
+            total -= size
+            evicted += 1
+        logger.debug(f"Evicted {evicted} LLM cache entries")
+
+    def stats(self) -> dict:
+        with self._lock:
+            entries, size = self._db.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM completions").fetchone()
+        return {"hits": self.hits, "misses": self.misses, "entries": entries, "bytes": size}
+
+    def close(self):
+        with self._lock:
+            self._db.close()
@@ -1,42 +1,81 @@
+import os
 from datetime import datetime
 from io import BytesIO
-from PyPDF2 import PdfReader, PdfWriter
-from reportlab.pdfgen import canvas
-from reportlab.lib.pagesizes import letter
-from reportlab.lib.styles import getSampleStyleSheet
-from reportlab.platypus import Paragraph
+from concurrent.futures import ProcessPoolExecutor
+from util.metrics import metrics
 
 import logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='[%(asctime)s] [%(levelname)s] %(message)s',
-    datefmt='%H:%M:%S'
-)
 logger = logging.getLogger(__name__)
 
+def _init_worker(template_path: str, output_path: str):
+    global _worker_formatter
+    _worker_formatter = LMFormatter(template_path, output_path)
+
+
+def _render_in_worker(job: tuple) -> bytes:
+    text, output_path = job
+    return _worker_formatter.format_to_pdf(text, output_path)
+
+
 class LMFormatter:
-    def __init__(self, config):
+    def __init__(self, template_path: str, output_path: str = "LM.pdf"):
         """
         Initializes the LMFormatter with a template PDF file.
+        The template is parsed and the paragraph style built once, on the first letter, then reused for every letter.
         
         Args:
             template_path (str): Path to the template PDF file.
+            output_path (str, optional): Default path of the formatted PDF.
         """
-        self.template_path = config.get('lm_template_path', 'pdf')
+        self.template_path = template_path
+        self.output_path = output_path
+        self.template_pages = None
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(config.get('lm_template_path', 'pdf'), config.get('lm_output_path', 'pdf'))
 
-    def format_to_pdf(self, text: str, output_path: str = "output.pdf"):
+    def load_template(self):
+        from PyPDF2 import PdfReader
+        from reportlab.lib.styles import getSampleStyleSheet
+
+        # merge_page modifies the page it is called on, so these pages are only ever merged into blank ones
+        self.template_pages = list(PdfReader(self.template_path).pages)
+
+        style = getSampleStyleSheet()["BodyText"]
+        style.fontName = "Helvetica"
+        style.fontSize = 10
+        style.leading = 12
+        style.alignment = 4  # Justified alignment
+        self.style = style
+
+    def output_path_for(self, company: str) -> str:
+        """
+        Returns a per-company variant of lm_output_path, e.g. LM_example.com.pdf
+        """
+        root, ext = os.path.splitext(self.output_path)
+        return f"{root}_{company}{ext}"
+
+    @metrics.timed("pdf_render")
+    def format_to_pdf(self, text: str, output_path: str = None) -> bytes:
         """
         Places the current date at a fixed position and inserts the provided text.
         
         Args:
             text (str): The text to be inserted into the PDF. It can contain newlines (\n).
-            output_path (str): The path where the formatted PDF will be saved.
+            output_path (str, optional): The path where the formatted PDF will be saved. Nothing is written if None.
+
+        Returns:
+            bytes: The formatted PDF.
         """
-        logger.info(f"Formatting PDF to {output_path}")
-        
-        # Read the template PDF
-        reader = PdfReader(self.template_path)
-        writer = PdfWriter()
+        from PyPDF2 import PdfReader, PdfWriter, PageObject
+        from reportlab.pdfgen import canvas
+        from reportlab.lib.pagesizes import letter
+        from reportlab.platypus import Paragraph
+
+        logger.info(f"Formatting PDF to {output_path or 'memory'}")
+        if self.template_pages is None:
+            self.load_template()
 
         # Create a new PDF layer for replacements
         packet = BytesIO()
@@ -45,20 +84,13 @@ class LMFormatter:
         # Replace newlines (\n) with HTML <br/> tags
         text_with_breaks = text.replace("\n", "<br/>")
 
-        styles = getSampleStyleSheet()
-        style = styles["BodyText"]
-        style.fontName = "Helvetica"
-        style.fontSize = 10
-        style.leading = 12
-        style.alignment = 4  # Justified alignment
-
         x_offset = 10
         y_offset = 120
         margin = 70
         width = letter[0] - 2 * margin
         height = letter[1] - 2 * margin
 
-        paragraph = Paragraph(text_with_breaks, style)
+        paragraph = Paragraph(text_with_breaks, self.style)
         paragraph.wrapOn(can, width, height)
         
         paragraph_y = letter[1] - margin - paragraph.height - y_offset
@@ -73,21 +105,59 @@ class LMFormatter:
         # Merge the new PDF layer with the template
         packet.seek(0)
         new_pdf = PdfReader(packet)
+        writer = PdfWriter()
 
-        for page in reader.pages:
+        for template_page in self.template_pages:
+            page = PageObject.create_blank_page(width = template_page.mediabox.width, height = template_page.mediabox.height)
+            page.merge_page(template_page)
             page.merge_page(new_pdf.pages[0])
             writer.add_page(page)
 
-        with open(output_path, "wb") as output_pdf:
-            writer.write(output_pdf)
+        output = BytesIO()
+        writer.write(output)
+        pdf = output.getvalue()
+
+        if output_path:
+            with open(output_path, "wb") as output_pdf:
+                output_pdf.write(pdf)
             
-        logger.info(f"PDF formatted successfully to {output_path}")
+        logger.info(f"PDF formatted successfully to {output_path or 'memory'}")
+        return pdf
+
+    def format_many(self, texts: list[str], output_paths: list[str] = None, processes: int = 0) -> list[bytes]:
+        """
+        Renders many cover letters in one call.
+        
+        Args:
+            texts (list[str]): The letters to render.
+            output_paths (list[str], optional): Where to save each letter, None entries are kept in memory only.
+            processes (int, optional): Size of the process pool to fan out to. Letters are rendered in this process if 0.
+
+        Returns:
+            list[bytes]: The formatted PDFs, in the order of texts.
+        """
+        jobs = list(zip(texts, output_paths or [None] * len(texts)))
+        if processes <= 1 or len(jobs) <= 1:
+            return [self.format_to_pdf(text, output_path) for text, output_path in jobs]
+
+        with ProcessPoolExecutor(
+            max_workers = processes,
+            initializer = _init_worker,
+            initargs = (self.template_path, self.output_path)
+        ) as pool:
+            chunksize = max(1, len(jobs) // (processes * 4))
+            return list(pool.map(_render_in_worker, jobs, chunksize = chunksize))
 
 if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO,
+        format='[%(asctime)s] [%(levelname)s] %(message)s',
+        datefmt='%H:%M:%S'
+    )
     from lmwriter import LMWriter
     from config import Config
     config = Config()
-    formatter = LMFormatter(config)
+    formatter = LMFormatter.from_config(config)
     writer = LMWriter(config)
     text = writer.generate_lm("Google", save_to_file = False)
     formatter.format_to_pdf(text, config.get('lm_output_path', 'pdf'))
\ No newline at end of file
@@ -1,29 +1,97 @@
-from openai import OpenAI
+from concurrent.futures import ThreadPoolExecutor
+from util.llmcache import LLMCache
+from util.router import ModelRouter, is_retryable
+from util.metrics import metrics
 
 import logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='[%(asctime)s] [%(levelname)s] %(message)s',
-    datefmt='%H:%M:%S'
-)
 logger = logging.getLogger(__name__)
 
 class LMWriter:
-    def __init__(self, config):
+    def __init__(self, config, llm_cache: LLMCache = None, router: ModelRouter = None):
         """
         Generates cover letter using OpenAI's API
+        Completions are looked up in llm_cache first, and requests go to the model picked by router.
+        Both are opened from the config if not given.
         """
         self.config = config
-        self.client: OpenAI = OpenAI(base_url = config.get('openai_base_url', 'openai'), api_key = config.get('openai_api_key', 'openai'))
-        self.models = ["CHATGPT-4O-LATEST"] 
+        self.router = router or ModelRouter.from_config(config)
+        self.models = config.get('lm_models', 'openai', fallback = "chatgpt-4o-latest").split()
+        self.concurrency = config.getint('lm_concurrency', 'openai', fallback = 4)
+        self.max_retries = config.getint('lm_max_retries', 'openai', fallback = 5)
+        self.llm_cache = llm_cache or LLMCache.from_config(config)
+
+    def complete(self, instructions: str, prompt: str, on_token = None) -> str:
+        """
+        Runs one chat completion on the model picked by the router, retrying with exponential
+        backoff on 429 and 5xx responses. Slow non-streamed calls may be hedged on another model.
+        Completions are served from the LLM cache when the same request was made before.
+        If on_token is given, the completion is streamed and each piece of text is passed
+        to it as it arrives; a cached completion is passed in one piece.
+        """
+        cache_key = LLMCache.make_key(" ".join(self.models), instructions, prompt, max_tokens = 1000)
+        cached = self.llm_cache.get(cache_key)
+        if cached is not None:
+            logger.info("Cover letter served from LLM cache")
+            if on_token:
+                on_token(cached)
+            return cached
+
+        streamed = False
+
+        def request(client, model):
+            nonlocal streamed
+            response = client.chat.completions.create(
+                model = model,
+                messages=[
+                    {
+                        "role": "system",
+                        "content": instructions,
+                    },
+                    {
+                        "role": "user",
+                        "content": prompt
+                    }
+                ],
+                max_tokens = 1000,
+                stream = on_token is not None,
+                **({"stream_options": {"include_usage": True}} if on_token else {})
+            )
+            if on_token is None:
+                if response.usage:
+                    metrics.increment("generation_tokens", response.usage.total_tokens)
+                return response.choices[0].message.content
+
+            parts = []
+            for chunk in response:
+                if getattr(chunk, "usage", None):
+                    metrics.increment("generation_tokens", chunk.usage.total_tokens)
+                token = chunk.choices[0].delta.content if chunk.choices else None
+                if token:
+                    streamed = True
+                    parts.append(token)
+                    on_token(token)
+            return "".join(parts)
+
+        with metrics.timer("generation"):
+            content = self.router.call(
+                self.models,
+                request,
+                hedge = on_token is None,
+                retries = self.max_retries,
+                # once tokens were shown, a retry would repeat them
+                retry_if = lambda e: not streamed and is_retryable(e)
+            ).strip()
+        self.llm_cache.put(cache_key, content)
+        return content
         
-    def generate_lm(self, company_info: str, user_info: str = None, first_part: str = None, save_to_file: bool = True):
+    def generate_lm(self, company_info: str, user_info: str = None, first_part: str = None, save_to_file: bool = True, on_token = None):
         """
         Generates a cover letter using OpenAI's API
         Args:
             company_info (str): _description_
             job_info (str): _description_
             user_info (str): _description_
+            on_token (callable, optional): streams the letter, first_part included, to this callback as it is generated
         """
         logger.info(f"Generating cover letter for {company_info}")
         
@@ -38,25 +106,13 @@ class LMWriter:
         prompt = self.config.get("lm_prompt", "openai").format(COMPANY_INFO=company_info, USER_INFO=user_info, FIRST_PART=first_part)
         instructions = self.config.get("lm_system_instructions", "openai")
         
-        response = self.client.chat.completions.create(
-            model = self.models[0].lower(),
-            messages=[
-                {
-                    "role": "system",
-                    "content": instructions,
-                },
-                {
-                    "role": "user",
-                    "content": prompt
-                }
-            ],
-            max_tokens = 1000,
-            stream = False
-        )
+        if on_token:
+            on_token(first_part + "\n\n")
+        content = self.complete(instructions, prompt, on_token = on_token)
         
         logger.info(f"Generated cover letter for {company_info}")
         
-        output = first_part + "\n\n" + response.choices[0].message.content.strip()
+        output = first_part + "\n\n" + content
         
         if save_to_file:
             logger.info(f"Saving cover letter for {company_info} to file LM.txt")
@@ -64,9 +120,38 @@ class LMWriter:
                 f.write(output)
         
         return output
+
+    def generate_many(self, companies: dict, user_info: str = None, first_part: str = None) -> dict:
+        """
+        Generates cover letters for many companies concurrently, at most `lm_concurrency` at a time.
+        Args:
+            companies (dict): company key (e.g. domain) -> company info
+            user_info (str): see generate_lm
+            first_part (str): see generate_lm
+        Returns:
+            dict: company key -> generated letter, or the exception raised for that company
+        """
+        results = {}
+        with ThreadPoolExecutor(max_workers = self.concurrency) as executor:
+            futures = {
+                key: executor.submit(self.generate_lm, company_info = info, user_info = user_info, first_part = first_part, save_to_file = False)
+                for key, info in companies.items()
+            }
+            for key, future in futures.items():
+                try:
+                    results[key] = future.result()
+                except Exception as e:
+                    logger.error(f"Failed to generate cover letter for {key}: {e}")
+                    results[key] = e
+        return results
     
 
 if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO,
+        format='[%(asctime)s] [%(levelname)s] %(message)s',
+        datefmt='%H:%M:%S'
+    )
     from config import Config
     config = Config()
     lm_writer = LMWriter(config)
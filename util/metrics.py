@@ -0,0 +1,171 @@
+import os
+import csv
+import json
+import math
+import time
+import bisect
+import threading
+import functools
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+
+import logging
+logger = logging.getLogger(__name__)
+
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, math.inf)
+
+
+class Histogram:
+    def __init__(self, samples: int = 10000):
+        """
+        Latency distribution in seconds: cumulative-ready bucket counts for Prometheus,
+        plus the last `samples` observations for percentiles.
+        """
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.buckets = [0] * len(BUCKETS)
+        self.samples = deque(maxlen = samples)
+
+    def observe(self, seconds: float):
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+        self.buckets[bisect.bisect_left(BUCKETS, seconds)] += 1
+        self.samples.append(seconds)
+
+    def percentile(self, fraction: float) -> float:
+        samples = sorted(self.samples)
+        return samples[min(len(samples) - 1, int(len(samples) * fraction))] if samples else 0.0
+
+    def summary(self) -> dict:
+        return {
+            "count": self.count,
+            "mean": self.total / self.count if self.count else 0.0,
+            "p50": self.percentile(0.5),
+            "p90": self.percentile(0.9),
+            "p99": self.percentile(0.99),
+            "max": self.max
+        }
+
+
+class Metrics:
+    def __init__(self):
+        """
+        Thread-safe counters and latency histograms of the pipeline stages.
+        Timers are named after the stage (fetch, summary, generation, pdf_render, smtp_send,
+        sheets_append); a failed timed call also increments "<stage>_failures".
+        """
+        self.counters = {}
+        self.histograms = {}
+        self.started_at = time.time()
+        self._lock = threading.Lock()
+
+    def increment(self, name: str, value: float = 1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def observe(self, name: str, seconds: float):
+        with self._lock:
+            self.histograms.setdefault(name, Histogram()).observe(seconds)
+
+    @contextmanager
+    def timer(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        except Exception:
+            self.increment(f"{name}_failures")
+            raise
+        finally:
+            self.observe(name, time.perf_counter() - start)
+
+    def timed(self, name: str):
+        """
+        Decorator timing every call of a function with timer(name).
+        """
+        def decorator(function):
+            @functools.wraps(function)
+            def wrapper(*args, **kwargs):
+                with self.timer(name):
+                    return function(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "started_at": datetime.fromtimestamp(self.started_at).isoformat(timespec = "seconds"),
+                "duration": time.time() - self.started_at,
+                "counters": dict(sorted(self.counters.items())),
+                "timers": {name: histogram.summary() for name, histogram in sorted(self.histograms.items())}
+            }
+
+    def write_json(self, path: str):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.snapshot(), f, indent = 4)
+
+    def write_csv(self, path: str):
+        """
+        One row per timer and per counter: name, kind, count/value, then the latency summary.
+        """
+        snapshot = self.snapshot()
+        with open(path, "w", encoding="utf-8", newline = "") as f:
+            writer = csv.writer(f)
+            writer.writerow(["name", "kind", "count", "mean", "p50", "p90", "p99", "max"])
+            for name, timer in snapshot["timers"].items():
+                writer.writerow([name, "timer", timer["count"]] + [f"{timer[key]:.6f}" for key in ("mean", "p50", "p90", "p99", "max")])
+            for name, value in snapshot["counters"].items():
+                writer.writerow([name, "counter", value, "", "", "", "", ""])
+
+    def write_prometheus(self, path: str, prefix: str = "pyapplier"):
+        """
+        Writes the metrics in the Prometheus text exposition format, e.g. for node_exporter's textfile collector.
+        """
+        lines = []
+        with self._lock:
+            for name, value in sorted(self.counters.items()):
+                lines += [f"# TYPE {prefix}_{name}_total counter", f"{prefix}_{name}_total {value}"]
+            for name, histogram in sorted(self.histograms.items()):
+                lines.append(f"# TYPE {prefix}_{name}_seconds histogram")
+                cumulative = 0
+                for bound, count in zip(BUCKETS, histogram.buckets):
+                    cumulative += count
+                    le = "+Inf" if bound == math.inf else str(bound)
+                    lines.append(f'{prefix}_{name}_seconds_bucket{{le="{le}"}} {cumulative}')
+                lines += [f"{prefix}_{name}_seconds_sum {histogram.total}", f"{prefix}_{name}_seconds_count {histogram.count}"]
+
+        temporary_path = path + ".tmp"
+        with open(temporary_path, "w", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
+        os.replace(temporary_path, path)
+
+    def write_report(self, directory: str, prometheus_path: str = None) -> str:
+        """
+        Writes run_<timestamp>.json and .csv to directory, and the Prometheus file if a path is given.
+        Returns the path of the JSON report.
+        """
+        os.makedirs(directory, exist_ok = True)
+        name = os.path.join(directory, datetime.fromtimestamp(self.started_at).strftime("run_%Y%m%d_%H%M%S"))
+        self.write_json(name + ".json")
+        self.write_csv(name + ".csv")
+        if prometheus_path:
+            self.write_prometheus(prometheus_path)
+        logger.info(f"Run report written to {name}.json")
+        return name + ".json"
+
+    def format(self) -> str:
+        snapshot = self.snapshot()
+        lines = [f"{'stage':<16} {'count':>6} {'mean':>8} {'p50':>8} {'p90':>8} {'p99':>8} {'failed':>6}"]
+        for name, timer in snapshot["timers"].items():
+            failures = snapshot["counters"].get(f"{name}_failures", 0)
+            lines.append(f"{name:<16} {timer['count']:>6} " + " ".join(f"{timer[key]:>7.2f}s" for key in ("mean", "p50", "p90", "p99")) + f" {failures:>6}")
+        for name, value in snapshot["counters"].items():
+            if not name.endswith("_failures"):
+                lines.append(f"{name:<16} {value:>6}")
+        return "\n".join(lines)
+
+
+# registry shared by every module of a run
+metrics = Metrics()
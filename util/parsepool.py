@@ -0,0 +1,91 @@
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, wait
+from util.extractor import EmailExtractor
+from util.htmltext import html_to_text
+
+import logging
+logger = logging.getLogger(__name__)
+
+def _init_worker(blacklist: list[str]):
+    global _worker_extractor
+    _worker_extractor = EmailExtractor(blacklist)
+
+
+def _parse_chunk(pages: list[str]) -> list[set[str]]:
+    return [_worker_extractor.extract(html_to_text(html)) for html in pages]
+
+
+class ParsePool:
+    def __init__(self, blacklist: list[str], processes: int, chunk_size: int = 8, max_chunks: int = None):
+        """
+        Extracts emails from fetched pages in worker processes, off the fetch threads.
+        Pages are sent in chunks of chunk_size. At most max_chunks chunks (default 2 per process)
+        are queued or being parsed; add() blocks past that, so memory stays flat when pages
+        are fetched faster than they are parsed.
+        Workers are started by a fork server (spawned where there is none): the pool starts them
+        from the fetch threads, and a plain fork there could copy a lock another thread is holding.
+        """
+        self.chunk_size = chunk_size
+        start_method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+        self.executor = ProcessPoolExecutor(
+            max_workers = processes,
+            mp_context = multiprocessing.get_context(start_method),
+            initializer = _init_worker,
+            initargs = (blacklist,)
+        )
+        self._slots = threading.BoundedSemaphore(max_chunks or 2 * processes)
+        self._chunk = []
+        self._futures = set()
+        self._lock = threading.Lock()
+
+    def _submit(self, chunk: list[str]):
+        self._slots.acquire()
+        future = self.executor.submit(_parse_chunk, chunk)
+        future.add_done_callback(lambda _: self._slots.release())
+        with self._lock:
+            self._futures.add(future)
+
+    def add(self, html: str):
+        """
+        Queues a page, sending the current chunk to the pool once it is full.
+        """
+        with self._lock:
+            self._chunk.append(html)
+            if len(self._chunk) < self.chunk_size:
+                return
+            chunk, self._chunk = self._chunk, []
+        self._submit(chunk)
+
+    def flush(self):
+        """
+        Sends the pages of the incomplete chunk to the pool.
+        """
+        with self._lock:
+            chunk, self._chunk = self._chunk, []
+        if chunk:
+            self._submit(chunk)
+
+    def results(self, wait_all: bool = False) -> list[set[str]]:
+        """
+        Returns the email sets of the chunks parsed since the last call,
+        waiting for every queued chunk first if wait_all is set.
+        """
+        with self._lock:
+            futures = set(self._futures)
+        if wait_all:
+            wait(futures)
+        done = {future for future in futures if future.done()}
+        with self._lock:
+            self._futures -= done
+        return [emails for future in done for emails in future.result()]
+
+    def extract_many(self, pages: list[str]) -> list[set[str]]:
+        """
+        Returns the emails of each page, in order.
+        """
+        chunks = [pages[i:i + self.chunk_size] for i in range(0, len(pages), self.chunk_size)]
+        return [emails for chunk in self.executor.map(_parse_chunk, chunks) for emails in chunk]
+
+    def close(self):
+        self.executor.shutdown(wait = False, cancel_futures = True)
@@ -0,0 +1,109 @@
+import queue
+import threading
+
+import logging
+logger = logging.getLogger(__name__)
+
+_DONE = object()
+
+
+class Prefetcher:
+    def __init__(self, stages: list[tuple], lookahead: int = 3):
+        """
+        Runs items through a chain of stages in background threads, ahead of whoever consumes them.
+        Args:
+            stages (list): (name, function, workers) tuples. function(key, item) returns the item
+                handed to the next stage and runs in `workers` threads of its own.
+            lookahead (int): size of the queues between stages, i.e. how many items may wait
+                finished at the end of a stage before the next one takes them.
+        """
+        self.stages = stages
+        self.lookahead = lookahead
+
+    def _put(self, output: queue.Queue, entry, stop: threading.Event) -> bool:
+        while not stop.is_set():
+            try:
+                output.put(entry, timeout = 0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _feed(self, items, output: queue.Queue, stop: threading.Event):
+        for key, item in items:
+            if not self._put(output, (key, item, None), stop):
+                return
+        self._put(output, _DONE, stop)
+
+    def _work(self, name: str, function, source: queue.Queue, output: queue.Queue, stop: threading.Event, remaining: list, lock: threading.Lock):
+        while not stop.is_set():
+            try:
+                entry = source.get(timeout = 0.1)
+            except queue.Empty:
+                continue
+            if entry is _DONE:
+                source.put(_DONE) # let the other workers of this stage see it
+                with lock:
+                    remaining[0] -= 1
+                    last = remaining[0] == 0
+                if last:
+                    self._put(output, _DONE, stop)
+                return
+
+            key, item, error = entry
+            if error is None:
+                try:
+                    item = function(key, item)
+                except Exception as e:
+                    logger.error(f"{name} failed for {key}: {e}")
+                    error = e
+            if not self._put(output, (key, item, error), stop):
+                return
+
+    def run(self, items):
+        """
+        Yields (key, item, error) for every (key, item) of items once it went through all stages,
+        in the order they finish. error is the exception raised by the first failing stage, if any.
+        Closing the generator stops the background threads.
+        """
+        stop = threading.Event()
+        queues = [queue.Queue(maxsize = self.lookahead) for _ in range(len(self.stages) + 1)]
+        threads = [threading.Thread(target = self._feed, args = (items, queues[0], stop), daemon = True)]
+        for index, (name, function, workers) in enumerate(self.stages):
+            remaining = [workers]
+            lock = threading.Lock()
+            for _ in range(workers):
+                threads.append(threading.Thread(
+                    target = self._work,
+                    args = (name, function, queues[index], queues[index + 1], stop, remaining, lock),
+                    name = name,
+                    daemon = True
+                ))
+        for thread in threads:
+            thread.start()
+
+        try:
+            while True:
+                entry = queues[-1].get()
+                if entry is _DONE:
+                    return
+                yield entry
+        finally:
+            stop.set()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO,
+        format='[%(asctime)s] [%(levelname)s] %(message)s',
+        datefmt='%H:%M:%S'
+    )
+    import time
+
+    def slow_square(key, item):
+        time.sleep(0.5)
+        return item * item
+
+    prefetcher = Prefetcher([("square", slow_square, 2), ("add", lambda key, item: item + 1, 1)])
+    for key, item, error in prefetcher.run((str(i), i) for i in range(6)):
+        print(key, item, error)
@@ -0,0 +1,161 @@
+import time
+import random
+import threading
+from collections import deque
+from typing import TYPE_CHECKING
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+if TYPE_CHECKING:
+    from openai import OpenAI
+
+import logging
+logger = logging.getLogger(__name__)
+
+
+def is_retryable(error: Exception) -> bool:
+    """
+    Rate limits (429), server errors (5xx) and connection failures are worth another try.
+    """
+    from openai import APIStatusError, APIConnectionError
+
+    if isinstance(error, APIStatusError):
+        return error.status_code == 429 or error.status_code >= 500
+    return isinstance(error, APIConnectionError)
+
+
+class ModelRouter:
+    def __init__(self, base_url: str, api_key: str, window: int = 50, max_age: float = 300,
+                 error_threshold: float = 0.5, hedge_percentile: float = 0.9, hedge_min_samples: int = 10):
+        """
+        Picks the fastest healthy model for each LLM call.
+        Targets are model names, optionally bound to another endpoint as "model@base_url".
+        The last `window` calls of each target younger than `max_age` seconds give its latency and
+        error rate; targets failing more than error_threshold of the time are used last.
+        When a call runs longer than the hedge_percentile latency of its target, a duplicate
+        request is sent to the next best target and the first answer wins (0 disables hedging).
+        """
+        self.base_url = base_url
+        self.api_key = api_key
+        self.window = window
+        self.max_age = max_age
+        self.error_threshold = error_threshold
+        self.hedge_percentile = hedge_percentile
+        self.hedge_min_samples = hedge_min_samples
+
+        self._clients = {}
+        self._samples = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers = 16, thread_name_prefix = "router")
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(
+            base_url = config.get('openai_base_url', 'openai'),
+            api_key = config.get('openai_api_key', 'openai'),
+            hedge_percentile = config.getfloat('hedge_percentile', 'openai', fallback = 0.9)
+        )
+
+    def resolve(self, target: str) -> tuple["OpenAI", str]:
+        """
+        Returns the client and model name of a target.
+        Clients are created on first use and do not retry on their own, call() does.
+        """
+        from openai import OpenAI
+
+        model, _, base_url = target.partition("@")
+        base_url = base_url or self.base_url
+        with self._lock:
+            if base_url not in self._clients:
+                self._clients[base_url] = OpenAI(base_url = base_url, api_key = self.api_key, max_retries = 0)
+            return self._clients[base_url], model
+
+    def record(self, target: str, latency: float, ok: bool):
+        with self._lock:
+            samples = self._samples.setdefault(target, deque(maxlen = self.window))
+            samples.append((time.monotonic(), latency, ok))
+
+    def _recent(self, target: str) -> list[tuple]:
+        now = time.monotonic()
+        with self._lock:
+            return [sample for sample in self._samples.get(target, ()) if now - sample[0] < self.max_age]
+
+    def stats(self, target: str) -> dict:
+        samples = self._recent(target)
+        latencies = sorted(latency for _, latency, ok in samples if ok)
+        return {
+            "calls": len(samples),
+            "error_rate": sum(not ok for _, _, ok in samples) / len(samples) if samples else 0.0,
+            "median": latencies[len(latencies) // 2] if latencies else None,
+            "latencies": latencies
+        }
+
+    def rank(self, targets: list[str]) -> list[str]:
+        """
+        Orders targets from best to worst: healthy ones by median latency, then the
+        others by error rate. Targets without recent calls are tried first, in list order.
+        """
+        def key(target):
+            stats = self.stats(target)
+            if stats["error_rate"] >= self.error_threshold:
+                return (1, stats["error_rate"])
+            return (0, stats["median"] or 0.0)
+        return sorted(targets, key = key)
+
+    def hedge_delay(self, target: str) -> float | None:
+        if not self.hedge_percentile:
+            return None
+        latencies = self.stats(target)["latencies"]
+        if len(latencies) < self.hedge_min_samples:
+            return None
+        return latencies[min(len(latencies) - 1, int(len(latencies) * self.hedge_percentile))]
+
+    def _attempt(self, target: str, request):
+        client, model = self.resolve(target)
+        start = time.monotonic()
+        try:
+            result = request(client, model)
+        except Exception:
+            self.record(target, time.monotonic() - start, False)
+            raise
+        self.record(target, time.monotonic() - start, True)
+        return result
+
+    def _call_once(self, targets: list[str], request, hedge: bool):
+        ranked = self.rank(targets)
+        delay = self.hedge_delay(ranked[0]) if hedge and len(ranked) > 1 else None
+        if delay is None:
+            return self._attempt(ranked[0], request)
+
+        primary = self._executor.submit(self._attempt, ranked[0], request)
+        done, _ = wait([primary], timeout = delay)
+        if done:
+            return primary.result()
+
+        logger.info(f"{ranked[0]} slower than {delay:.1f}s, hedging with {ranked[1]}")
+        hedged = self._executor.submit(self._attempt, ranked[1], request)
+        done, _ = wait([primary, hedged], return_when = FIRST_COMPLETED)
+        first = done.pop()
+        if first.exception() is None:
+            return first.result()
+        return (hedged if first is primary else primary).result()
+
+    def call(self, targets: list[str], request, hedge: bool = True, retries: int = 0, retry_if = is_retryable):
+        """
+        Runs request(client, model) on the best of targets and returns its result.
+        Failed calls matching retry_if are retried up to `retries` times with exponential
+        backoff, each time on the target that ranks best after the failure was recorded.
+        A Retry-After header sent by the server takes precedence over the computed delay.
+        """
+        for attempt in range(retries + 1):
+            try:
+                return self._call_once(targets, request, hedge)
+            except Exception as e:
+                if attempt >= retries or not retry_if(e):
+                    raise
+                delay = 2 ** attempt + random.random()
+                response = getattr(e, "response", None)
+                retry_after = response.headers.get("retry-after") if response is not None else None
+                if retry_after and retry_after.isdigit():
+                    delay = int(retry_after)
+                logger.warning(f"LLM request failed ({e}), retrying in {delay:.1f}s")
+                time.sleep(delay)
@@ -1,146 +1,368 @@
-import re
-import requests
-from openai import OpenAI
-from bs4 import BeautifulSoup
-from googlesearch import search
+import time
+import codecs
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from urllib.parse import urlsplit
 from util.config import Config
+from util.httpcache import ResponseCache
+from util.htmltext import TextExtractor, is_html
+from util.extractor import EmailExtractor
+from util.parsepool import ParsePool
+from util.crawlindex import CrawlIndex
+from util.llmcache import LLMCache
+from util.distill import distill
+from util.router import ModelRouter
+from util.metrics import metrics
 
 import logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='[%(asctime)s] [%(levelname)s] %(message)s',
-    datefmt='%H:%M:%S'
-)
 logger = logging.getLogger(__name__)
 
 
+class HostRateLimiter:
+    def __init__(self, delay: float):
+        """
+        Spaces out requests made to the same host by at least `delay` seconds.
+        """
+        self.delay = delay
+        self._next_slot = {}
+        self._lock = threading.Lock()
+
+    def wait(self, host: str, stop: threading.Event) -> bool:
+        """
+        Blocks until a request to host is allowed.
+        Returns False if stop was set while waiting.
+        """
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot.get(host, now))
+            self._next_slot[host] = slot + self.delay
+        return not stop.wait(slot - now)
+
+
 class Scraper:
-    def __init__(self, config: Config, num_results: int = 150, max_emails: int = 50, use_ai: bool = False):
+    FETCH_HEADERS = {
+        "accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8,application/signed-exchange;v=b3;q=0.7",
+        "accept-encoding": "gzip, deflate, br, zstd",
+        "accept-language": "fr-FR,fr;q=0.9,en-US;q=0.8,en;q=0.7",
+        "priority": "u=0, i",
+        "referer": "https://www.google.com/",
+        "sec-ch-ua": "\"Not A(Brand\";v=\"8\", \"Chromium\";v=\"132\", \"Google Chrome\";v=\"132\"",
+        "sec-ch-ua-mobile": "?0",
+        "sec-ch-ua-platform": "\"Windows\"",
+        "sec-fetch-dest": "document",
+        "sec-fetch-mode": "navigate", 
+        "sec-fetch-site": "cross-site",
+        "sec-fetch-user": "?1",
+        "upgrade-insecure-requests": "1",
+        "user-agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/132.0.0.0 Safari/537.36"
+    }
+
+    def __init__(self, config: Config, num_results: int = 150, max_emails: int = 50, use_ai: bool = False,
+                 workers: int = 8, host_delay: float = 1.0, llm_cache: LLMCache = None, router: ModelRouter = None,
+                 skip_domain = None, crawl_index: CrawlIndex = None):
         """
         Initialize the Scraper with search query and desired number of results.
+        Pages are fetched by `workers` threads, with at least `host_delay` seconds
+        between two requests to the same host.
+        Company summaries are looked up in llm_cache first, and requested from the model picked by router.
+        Both are opened from the config if not given.
+        Search results whose host matches skip_domain(host) are dropped before anything is fetched.
+        So are the results crawl_index (opened from the config if not given) already knows from a
+        previous run: URLs fetched recently, and domains already mined or contacted.
         """
         self.query = config.get('google_query', 'scraper')
         self.num_results = num_results
         self.emails = set()
         self.max_emails = max_emails
+        self.workers = workers
+        self.rate_limiter = HostRateLimiter(host_delay)
+        self.skip_domain = skip_domain
+        self.crawl_index = crawl_index or CrawlIndex.from_config(config)
+
+        self._session = None
+        self._session_lock = threading.Lock()
+
+        cache_path = config.get('cache_path', 'scraper', fallback = "cache/http.sqlite")
+        if cache_path:
+            self.cache = ResponseCache(
+                cache_path,
+                ttl = config.getfloat('cache_ttl', 'scraper', fallback = 86400),
+                max_age = config.getfloat('cache_max_age', 'scraper', fallback = 30 * 86400),
+                max_bytes = config.getint('cache_max_mb', 'scraper', fallback = 200) * 1024 * 1024
+            )
+        else:
+            self.cache = None
+        self.max_page_bytes = config.getint('max_page_bytes', 'scraper', fallback = 1048576)
+        self.homepage_url = config.get('homepage_url', 'scraper', fallback = "https://www.{domain}")
+
         self.blacklist = config.get('email_blacklist', 'scraper').split(' ')
+        self.extractor = EmailExtractor(self.blacklist)
+
+        # pages can be parsed in worker processes instead of the fetch threads (0 = in the fetch threads)
+        self.parse_processes = config.getint('parse_processes', 'scraper', fallback = 0)
+        self.parse_chunk_size = config.getint('parse_chunk_size', 'scraper', fallback = 8)
+        self.parse_pool = None
         
         if use_ai:
-            self.openai = OpenAI(base_url=config.get('openai_base_url', 'openai'), api_key = config.get('openai_api_key', 'openai'))
+            self.router = router or ModelRouter.from_config(config)
+            self.summary_models = config.get('summary_models', 'openai', fallback = "gpt-3.5-turbo").split()
+            self.llm_cache = llm_cache or LLMCache.from_config(config)
+            self.summary_token_budget = config.getint('summary_token_budget', 'openai', fallback = 1500)
         else:
-            self.openai = None
+            self.router = None
+            self.llm_cache = None
         
         logger.info(f"Blacklist: {self.blacklist}")
 
+    @property
+    def session(self):
+        """
+        One pooled session shared by every fetch thread, created on the first fetch.
+        """
+        with self._session_lock:
+            if self._session is None:
+                import requests
+                from requests.adapters import HTTPAdapter
+
+                session = requests.Session()
+                session.headers.update(self.FETCH_HEADERS)
+                adapter = HTTPAdapter(pool_connections = self.workers, pool_maxsize = self.workers)
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                self._session = session
+            return self._session
+
     def get_search_results(self):
         """
         Uses googlesearch with advanced option to get enriched results (title, URL, description).
+        Results are yielded as they arrive, so the next search page is only requested once
+        the results of the current one have been consumed.
         """
+        from googlesearch import search
+
         logger.info(f"Searching for {self.query} with {self.num_results} results")
-        results = []
         try:
-            for result in search(
+            yield from search(
                 self.query,
                 num_results = self.num_results,
                 advanced = True,
                 lang = "fr",
                 region = "fr",
                 # unique = True # comment if you get http 429 errors
-            ):
-                results.append(result)
+            )
         except Exception as e:
             logger.exception(e)
-            
-        return results
 
-    def fetch_page(self, url: str):
+    def fetch_page(self, url: str, stop: threading.Event = None, extractor: TextExtractor = None) -> str:
         """
         Fetches HTML content from a URL by adding headers to avoid 403 errors.
+        Pages are served from the response cache while fresh, and revalidated
+        with If-None-Match / If-Modified-Since once stale.
+        The body is streamed in chunks and truncated after max_page_bytes; non-HTML
+        responses are dropped as soon as their headers arrive. Each decoded chunk is
+        fed to extractor if given, and the download is abandoned if stop gets set.
         """
+        cached = self.cache.get(url) if self.cache else None
+        if cached and cached["fresh"]:
+            logger.debug(f"Cache hit for {url}")
+            metrics.increment("http_cache_hits")
+            if extractor:
+                extractor.feed(cached["body"])
+            return cached["body"]
+
         logger.debug(f"Fetching {url}")
-        headers = {
-            "accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8,application/signed-exchange;v=b3;q=0.7",
-            "accept-encoding": "gzip, deflate, br, zstd",
-            "accept-language": "fr-FR,fr;q=0.9,en-US;q=0.8,en;q=0.7",
-            "priority": "u=0, i",
-            "referer": "https://www.google.com/",
-            "sec-ch-ua": "\"Not A(Brand\";v=\"8\", \"Chromium\";v=\"132\", \"Google Chrome\";v=\"132\"",
-            "sec-ch-ua-mobile": "?0",
-            "sec-ch-ua-platform": "\"Windows\"",
-            "sec-fetch-dest": "document",
-            "sec-fetch-mode": "navigate", 
-            "sec-fetch-site": "cross-site",
-            "sec-fetch-user": "?1",
-            "upgrade-insecure-requests": "1",
-            "user-agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/132.0.0.0 Safari/537.36"
-        }
+        headers = {}
+        if cached:
+            if cached["etag"]:
+                headers["if-none-match"] = cached["etag"]
+            if cached["last_modified"]:
+                headers["if-modified-since"] = cached["last_modified"]
         
+        start = time.perf_counter()
         try:
-            response = requests.get(url, headers = headers, timeout = 2.5, allow_redirects = True)
-            if response.status_code == 200:
-                return response.text
-            else:
-                logger.error(f"Error fetching {url}: code {response.status_code}")
+            with self.session.get(url, headers = headers, timeout = 2.5, allow_redirects = True, stream = True) as response:
+                if response.status_code == 304 and cached:
+                    logger.debug(f"Cache revalidated for {url}")
+                    metrics.increment("http_cache_revalidated")
+                    self.cache.touch(url)
+                    if extractor:
+                        extractor.feed(cached["body"])
+                    return cached["body"]
+                elif response.status_code != 200:
+                    logger.error(f"Error fetching {url}: code {response.status_code}")
+                    metrics.increment("fetch_failures")
+                    return ""
+
+                content_type = response.headers.get("content-type", "")
+                if not is_html(content_type):
+                    logger.debug(f"Skipping {url}: content type {content_type}")
+                    return ""
+
+                encoding = response.encoding if "charset" in content_type.lower() else "utf-8"
+                decoder = codecs.getincrementaldecoder(encoding)(errors = "replace")
+                parts = []
+                size = 0
+                for chunk in response.iter_content(chunk_size = 16384):
+                    if stop is not None and stop.is_set():
+                        return ""
+                    chunk = chunk[:self.max_page_bytes - size]
+                    size += len(chunk)
+                    parts.append(decoder.decode(chunk))
+                    if extractor:
+                        extractor.feed(parts[-1])
+                    if size >= self.max_page_bytes:
+                        logger.debug(f"Truncated {url} after {size} bytes")
+                        break
+                metrics.increment("fetch_bytes", size)
+                parts.append(decoder.decode(b"", final = True))
+                if extractor:
+                    extractor.feed(parts[-1])
+
+            html = "".join(parts)
+            if self.cache:
+                self.cache.put(url, html, response.headers.get("etag"), response.headers.get("last-modified"))
+            return html
         except Exception as e:
             logger.error(f"Exception while fetching {url}: {e}")
+            metrics.increment("fetch_failures")
+        finally:
+            metrics.observe("fetch", time.perf_counter() - start)
         return ""
 
+    def fetch_text(self, url: str, stop: threading.Event = None) -> str:
+        """
+        Fetches a page and returns its visible text, extracted while the body streams in.
+        """
+        extractor = TextExtractor()
+        if not self.fetch_page(url, stop, extractor):
+            return ""
+        extractor.close()
+        return extractor.get_text()
+
     def extract_emails(self, text: str) -> set[str]:
         """
         Extracts email addresses from text using a regular expression.
         """
-        tlds = r'(?:com|net|org|fr|studio|dev|io|tech)'
-        email_regex = r'\b[a-z0-9._%+-]+@[a-zA-Z0-9.-]+\.' + tlds + r'\b'
-        blacklist_regex = '|'.join(self.blacklist)
-        emails = set(re.findall(email_regex, text, re.IGNORECASE))
-        
-        filtered_emails = {email for email in emails if not re.search(blacklist_regex, email)}
-        
-        valid_emails = set()
-        for email in filtered_emails:
-            local_part, domain = email.split('@', 1)
-            if local_part.islower() and local_part.replace('.', '').replace('_', '').isalnum():
-                valid_emails.add(email)
-                
-            if local_part[0].isdigit():
-                local_part = re.sub(r'^\d+', '', local_part)
-                email = f"{local_part}@{domain}"
-                if local_part.islower() and local_part.replace('.', '').replace('_', '').isalnum():
-                    valid_emails.add(email)
-                    
-        logger.debug(f"Extracted {len(valid_emails)} valid emails from text")
-        return valid_emails
-
-    def run(self):
+        return self.extractor.extract(text)
+
+    def scrape_result(self, res, stop: threading.Event) -> set[str]:
+        """
+        Extracts emails from the description and HTML content of a single search result.
+        Skips the page fetch if stop is set before the host allows a new request.
+        When pages are parsed in worker processes, only the description emails are returned.
+        """
+        emails = set()
+        host = urlsplit(res.url).netloc
+        if self.skip_domain and self.skip_domain(host):
+            logger.debug(f"Skipping {res.url}: domain is blacklisted")
+            return emails
+
+        if hasattr(res, 'description') and res.description:
+            description_emails = self.extract_emails(res.description)
+            if description_emails:
+                logger.info(f"Emails found in description for {res.url}: {description_emails}")
+            emails.update(description_emails)
+
+        if not self.rate_limiter.wait(host, stop):
+            return emails
+
+        # extract emails from the page content
+        if self.parse_pool:
+            html = self.fetch_page(res.url, stop)
+            self.record_fetch(res.url, bool(html), stop)
+            if html:
+                self.parse_pool.add(html) # emails come back through parse_pool.results()
+            return emails
+
+        text = self.fetch_text(res.url, stop)
+        self.record_fetch(res.url, bool(text), stop)
+        if text:
+            page_emails = self.extract_emails(text)
+            if page_emails:
+                logger.info(f"Emails found in {res.url}: {page_emails}")
+            emails.update(page_emails)
+
+        return emails
+
+    def is_known(self, res) -> bool:
+        """
+        True if the crawl index says the search result needs no fetch this run.
+        """
+        if self.crawl_index is None:
+            return False
+        return self.crawl_index.is_exhausted(urlsplit(res.url).netloc) or self.crawl_index.is_fresh(res.url)
+
+    def record_fetch(self, url: str, ok: bool, stop: threading.Event):
+        # fetches cut short by the end of the run are retried next run
+        if self.crawl_index is not None and not stop.is_set():
+            self.crawl_index.record_fetch(url, ok)
+
+    def run(self, on_emails = None):
         """
         Executes the entire process:
-         - Gets Google search results
-         - Extracts emails from description and HTML content of each URL
-         - Stops once x emails have been collected
+         - Streams Google search results
+         - Extracts emails from description and HTML content of each URL as soon as it arrives,
+           with at most 2 * workers results in flight
+         - Stops once x emails have been collected, cancelling pending fetches and requesting no more search pages
+        If on_emails is given, it is called with the emails of each result as soon as they are found.
+        With parse_processes set, pages are parsed in that many worker processes, in chunks of parse_chunk_size.
+        Results the crawl index already knows are skipped without taking a fetch slot, and the
+        emails found are recorded in it under their domain.
         """
+        if self.parse_processes:
+            self.parse_pool = ParsePool(self.blacklist, self.parse_processes, self.parse_chunk_size)
         results = self.get_search_results()
-        logger.info(f"Number of results found: {len(results)}")
-        
-        for res in results:
-            if hasattr(res, 'description') and res.description:
-                description_emails = self.extract_emails(res.description)
-                if description_emails:
-                    logger.info(f"Emails found in description for {res.url}: {description_emails}")
-                self.emails.update(description_emails)
-            
-            # extract emails from the page content
-            page_content = self.fetch_page(res.url)
-            if page_content:
-                soup = BeautifulSoup(page_content, 'html.parser')
-                text = soup.get_text()
-                page_emails = self.extract_emails(text)
-                if page_emails:
-                    logger.info(f"Emails found in {res.url}: {page_emails}")
-                self.emails.update(page_emails)
-            
-            if len(self.emails) >= self.max_emails:
-                break
-            
+        stop = threading.Event()
+        executor = ThreadPoolExecutor(max_workers = self.workers)
+        pending = set()
+        submitted = 0
+
+        def collect(done, wait_all = False) -> bool:
+            found = [future.result() for future in done]
+            if self.parse_pool:
+                found += self.parse_pool.results(wait_all)
+            for emails in found:
+                if on_emails and emails:
+                    on_emails(emails)
+                if self.crawl_index is not None and emails:
+                    self.crawl_index.add_emails(emails)
+                self.emails.update(emails)
+            return len(self.emails) >= self.max_emails
+
+        try:
+            quota_met = False
+            for res in results:
+                metrics.increment("search_results")
+                if self.is_known(res):
+                    metrics.increment("crawl_skipped")
+                    continue
+                pending.add(executor.submit(self.scrape_result, res, stop))
+                submitted += 1
+                if len(pending) >= 2 * self.workers:
+                    done, pending = wait(pending, return_when = FIRST_COMPLETED)
+                    if quota_met := collect(done):
+                        break
+
+            while pending and not quota_met:
+                done, pending = wait(pending, return_when = FIRST_COMPLETED)
+                quota_met = collect(done)
+
+            if self.parse_pool and not quota_met:
+                self.parse_pool.flush()
+                quota_met = collect((), wait_all = True)
+
+            if quota_met:
+                logger.info(f"Collected {len(self.emails)} emails after {submitted} results, cancelling remaining fetches")
+            else:
+                logger.info(f"Number of results found: {submitted}")
+        finally:
+            results.close()
+            stop.set()
+            executor.shutdown(wait = False, cancel_futures = True)
+            if self.parse_pool:
+                self.parse_pool.close()
+                self.parse_pool = None
+
         return list(self.emails)[:self.max_emails]
     
     @staticmethod
@@ -160,31 +382,43 @@ class Scraper:
     def getCompanyInfo(self, domain: str) -> dict:
         """
         Retrieves information about a company based on its domain
+        The homepage is distilled to its most informative text, within summary_token_budget tokens.
         """
-        if not self.openai:
+        if not self.router:
             logger.warning("OpenAI client not initialized - skipping company info retrieval")
             return {}
 
         company_info = {}
-        url = f"https://www.{domain}"
+        url = self.homepage_url.format(domain = domain)
 
         try:
-            page_content = self.fetch_page(url)
-            if page_content:
-                soup = BeautifulSoup(page_content, 'html.parser')
-                text = soup.get_text()
+            html = self.fetch_page(url)
+            if html:
+                text = distill(html, self.summary_token_budget)
+                instructions = "Résume l'entreprise demandée, en mentionnant la ville au début. (ex: Google, une entreprise de Mountain View, est (etc...))"
+                cache_key = LLMCache.make_key(" ".join(self.summary_models), instructions, text, max_tokens = 150, temperature = 0.7)
 
-                try:
-                    response = self.openai.chat.completions.create(
-                        model="gpt-3.5-turbo",
+                def request(client, model):
+                    response = client.chat.completions.create(
+                        model=model,
                         messages=[
-                            {"role": "system", "content": "Résume l'entreprise demandée, en mentionnant la ville au début. (ex: Google, une entreprise de Mountain View, est (etc...))"},
+                            {"role": "system", "content": instructions},
                             {"role": "user", "content": text}
                         ],
                         max_tokens=150,
                         temperature=0.7
                     )
-                    company_info['summary'] = response.choices[0].message.content.strip()
+                    if response.usage:
+                        metrics.increment("summary_tokens", response.usage.total_tokens)
+                    return response.choices[0].message.content.strip()
+
+                try:
+                    summary = self.llm_cache.get(cache_key)
+                    if summary is None:
+                        with metrics.timer("summary"):
+                            summary = self.router.call(self.summary_models, request, retries = 2)
+                        self.llm_cache.put(cache_key, summary)
+                    company_info['summary'] = summary
                 except Exception as e:
                     logger.error(f"Error summarizing text: {e}")
 
@@ -194,6 +428,11 @@ class Scraper:
         return company_info
     
 if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO,
+        format='[%(asctime)s] [%(levelname)s] %(message)s',
+        datefmt='%H:%M:%S'
+    )
     from config import Config
     config = Config()
     scraper = Scraper(config, num_results=500, max_emails=100)
@@ -1,28 +1,56 @@
-import gspread
-from oauth2client.service_account import ServiceAccountCredentials
+import os
+import json
+import time
+import atexit
+import random
+import threading
 from datetime import datetime
+from util.metrics import metrics
 
 import logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='[%(asctime)s] [%(levelname)s] %(message)s',
-    datefmt='%H:%M:%S'
-)
 logger = logging.getLogger(__name__)
 
 class Sheets:
-    def __init__(self, config):
+    def __init__(self, config, on_written = None):
         """
         Initialize the Logger with Google Sheets API credentials.
+        Nothing is authorized until the first flush. Rows are buffered and appended in one
+        request once sheets_batch_size rows are waiting, sheets_flush_interval seconds after
+        the first buffered row, or when the program exits. Rows that could not be appended
+        are kept in sheets_spill_path and sent again with the next flush.
+        on_written(rows) is called with the rows of each flush once they are in the sheet or
+        in the spill file, so that callers only checkpoint rows that can no longer be lost.
         """
-        scope = ["https://spreadsheets.google.com/feeds", "https://www.googleapis.com/auth/drive"]
-        creds = ServiceAccountCredentials.from_json_keyfile_name(config.get('google_sheets_creds_path', 'drive'), scope)
-        self.client = gspread.authorize(creds)
-        self.sheet = self.client.open(config.get('google_sheets_name', 'drive')).sheet1
+        self.creds_path = config.get('google_sheets_creds_path', 'drive')
+        self.sheet_name = config.get('google_sheets_name', 'drive')
+        self.batch_size = config.getint('sheets_batch_size', 'drive', fallback = 20)
+        self.flush_interval = config.getfloat('sheets_flush_interval', 'drive', fallback = 30)
+        self.spill_path = config.get('sheets_spill_path', 'drive', fallback = "sheets_spill.jsonl")
+        self.max_retries = 4
+        self.on_written = on_written
+
+        self._sheet = None
+        self._rows = []
+        self._timer = None
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        atexit.register(self.flush)
+
+    @property
+    def sheet(self):
+        if self._sheet is None:
+            import gspread
+            from oauth2client.service_account import ServiceAccountCredentials
+
+            scope = ["https://spreadsheets.google.com/feeds", "https://www.googleapis.com/auth/drive"]
+            creds = ServiceAccountCredentials.from_json_keyfile_name(self.creds_path, scope)
+            self.client = gspread.authorize(creds)
+            self._sheet = self.client.open(self.sheet_name).sheet1
+        return self._sheet
 
     def log_email(self, company_name, url, email_address):
         """
-        Logs email information to the Google Sheet.
+        Queues email information for the Google Sheet.
         """
         row = [
             company_name,
@@ -34,13 +62,83 @@ class Sheets:
             "Non",
             "Candidature spontanée"
         ]
-        
-        self.sheet.append_row(row, value_input_option='USER_ENTERED')
-        
-        logger.info(f"Logged email for {company_name} to Google Sheet.")
+
+        with self._lock:
+            self._rows.append(row)
+            pending = len(self._rows)
+            if pending < self.batch_size and self._timer is None:
+                self._timer = threading.Timer(self.flush_interval, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+
+        logger.info(f"Queued email for {company_name} for the Google Sheet.")
+        if pending >= self.batch_size:
+            self.flush()
+
+    def flush(self) -> bool:
+        """
+        Appends every buffered and previously spilled row with a single append_rows call,
+        retrying with exponential backoff. Rows are spilled to disk if every attempt fails.
+        """
+        with self._flush_lock:
+            with self._lock:
+                if self._timer is not None:
+                    self._timer.cancel()
+                    self._timer = None
+                rows = self._rows
+                self._rows = []
+
+            rows = self.load_spill() + rows
+            if not rows:
+                return True
+
+            for attempt in range(self.max_retries + 1):
+                try:
+                    with metrics.timer("sheets_append"):
+                        self.sheet.append_rows(rows, value_input_option='USER_ENTERED')
+                    metrics.increment("sheets_rows", len(rows))
+                    if os.path.exists(self.spill_path):
+                        os.remove(self.spill_path)
+                    logger.info(f"Logged {len(rows)} emails to Google Sheet.")
+                    if self.on_written:
+                        self.on_written(rows)
+                    return True
+                except Exception as e:
+                    if attempt >= self.max_retries:
+                        logger.error(f"Could not log {len(rows)} emails to Google Sheet ({e}), keeping them in {self.spill_path}")
+                        break
+                    delay = 2 ** attempt + random.random()
+                    logger.warning(f"Google Sheet append failed ({e}), retrying in {delay:.1f}s")
+                    time.sleep(delay)
+
+            with open(self.spill_path, "w", encoding="utf-8") as f:
+                for row in rows:
+                    f.write(json.dumps(row, ensure_ascii = False) + "\n")
+            if self.on_written:
+                self.on_written(rows)
+            return False
+
+    def close(self) -> bool:
+        """
+        Flushes the remaining rows, which also stops the flush timer, and unregisters the exit hook:
+        once closed, nothing is retried at exit nor reported to on_written.
+        """
+        atexit.unregister(self.flush)
+        return self.flush()
+
+    def load_spill(self) -> list:
+        if not os.path.exists(self.spill_path):
+            return []
+        with open(self.spill_path, "r", encoding="utf-8") as f:
+            return [json.loads(line) for line in f if line.strip()]
 
 
 if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO,
+        format='[%(asctime)s] [%(levelname)s] %(message)s',
+        datefmt='%H:%M:%S'
+    )
     from config import Config
     config = Config()
     sheets = Sheets(config)
@@ -49,4 +147,5 @@ if __name__ == "__main__":
     url = "https://example.com"
     email_address = "contact@example.com"
 
-    sheets.log_email(company_name, url, email_address)
\ No newline at end of file
+    sheets.log_email(company_name, url, email_address)
+    sheets.close()
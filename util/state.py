@@ -0,0 +1,132 @@
+import os
+import json
+import time
+import sqlite3
+import threading
+
+import logging
+logger = logging.getLogger(__name__)
+
+STAGES = ("scraped", "summarized", "generated", "rendered", "sent", "logged")
+
+
+def reached(stage: str, target: str) -> bool:
+    """
+    True if a company at `stage` has completed `target`.
+    """
+    return STAGES.index(stage) >= STAGES.index(target)
+
+
+class PipelineState:
+    def __init__(self, path: str = "cache/state.sqlite"):
+        """
+        Checkpoints each company's progress through the pipeline, so an interrupted run
+        resumes where it stopped instead of scraping, summarizing and generating again.
+        A company moves through STAGES in order and never moves back. The database is in
+        WAL mode, so it can be read (e.g. python -m util.state) while a run writes to it.
+        """
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok = True)
+
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread = False, timeout = 30)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS companies ("
+            "domain TEXT PRIMARY KEY, stage INTEGER, emails TEXT, info TEXT, letter TEXT, pdf BLOB, updated_at REAL)"
+        )
+        self._db.commit()
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(config.get('state_path', fallback = "cache/state.sqlite"))
+
+    def add_emails(self, domain: str, emails: list[str]):
+        """
+        Records emails found for domain, marking it as scraped if it is new.
+        """
+        with self._lock:
+            row = self._db.execute("SELECT emails FROM companies WHERE domain = ?", (domain,)).fetchone()
+            if row is None:
+                self._db.execute(
+                    "INSERT INTO companies (domain, stage, emails, updated_at) VALUES (?, 0, ?, ?)",
+                    (domain, json.dumps(emails), time.time())
+                )
+            else:
+                known = json.loads(row[0])
+                known += [email for email in emails if email not in known]
+                self._db.execute(
+                    "UPDATE companies SET emails = ?, updated_at = ? WHERE domain = ?",
+                    (json.dumps(known), time.time(), domain)
+                )
+            self._db.commit()
+
+    def advance(self, domain: str, stage: str, info: dict = None, letter: str = None, pdf: bytes = None):
+        """
+        Marks domain as having completed stage, storing what that stage produced.
+        """
+        with self._lock:
+            self._db.execute(
+                "UPDATE companies SET stage = MAX(stage, ?), info = COALESCE(?, info), letter = COALESCE(?, letter), "
+                "pdf = COALESCE(?, pdf), updated_at = ? WHERE domain = ?",
+                (STAGES.index(stage), None if info is None else json.dumps(info, ensure_ascii = False), letter, pdf, time.time(), domain)
+            )
+            self._db.commit()
+
+    def _record(self, row) -> dict:
+        domain, stage, emails, info, letter, pdf = row
+        return {
+            "domain": domain,
+            "stage": STAGES[stage],
+            "emails": json.loads(emails),
+            "info": None if info is None else json.loads(info),
+            "letter": letter,
+            "pdf": pdf
+        }
+
+    def get(self, domain: str) -> dict | None:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT domain, stage, emails, info, letter, pdf FROM companies WHERE domain = ?", (domain,)
+            ).fetchone()
+        return None if row is None else self._record(row)
+
+    def pending(self, until: str = "logged") -> dict:
+        """
+        Returns domain -> record for every company that has not completed `until` yet, oldest first.
+        """
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT domain, stage, emails, info, letter, pdf FROM companies WHERE stage < ? ORDER BY rowid",
+                (STAGES.index(until),)
+            ).fetchall()
+        return {row[0]: self._record(row) for row in rows}
+
+    def counts(self) -> dict:
+        """
+        Returns the number of companies whose last completed stage is each of STAGES.
+        """
+        with self._lock:
+            rows = self._db.execute("SELECT stage, COUNT(*) FROM companies GROUP BY stage").fetchall()
+        counts = dict.fromkeys(STAGES, 0)
+        for stage, count in rows:
+            counts[STAGES[stage]] = count
+        return counts
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO,
+        format='[%(asctime)s] [%(levelname)s] %(message)s',
+        datefmt='%H:%M:%S'
+    )
+    import sys
+    state = PipelineState(sys.argv[1] if len(sys.argv) > 1 else "cache/state.sqlite")
+    for stage, count in state.counts().items():
+        print(f"{stage:<12} {count}")